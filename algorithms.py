@@ -0,0 +1,50 @@
+import importlib
+import time
+
+# Algorithms offered by the UI, in display order, mapped to where their estimators live:
+# (module, classifier class, regressor class, accepts n_jobs, fixed classifier kwargs)
+ESTIMATORS = {
+    "Random Forest": ("sklearn.ensemble", "RandomForestClassifier", "RandomForestRegressor", True, {}),
+    "Gradient Boosting": ("sklearn.ensemble", "GradientBoostingClassifier", "GradientBoostingRegressor", False, {}),
+    "XGBoost": ("xgboost", "XGBClassifier", "XGBRegressor", True, {}),
+    "SVM": ("sklearn.svm", "SVC", "SVR", False, {"probability": True}),
+    "KNN": ("sklearn.neighbors", "KNeighborsClassifier", "KNeighborsRegressor", True, {}),
+}
+ALGORITHMS = list(ESTIMATORS)
+
+
+def estimator_class(algorithm, problem_type):
+    """Imports (on first use) and returns the estimator class for ``algorithm``.
+
+    Nothing heavier than this module is imported until an algorithm is
+    actually requested, which keeps API start-up fast.
+    """
+    if algorithm not in ESTIMATORS:
+        raise ValueError(f"Invalid algorithm '{algorithm}' selected.")
+    module, classifier, regressor, _, _ = ESTIMATORS[algorithm]
+    return getattr(importlib.import_module(module), classifier if problem_type == "classification" else regressor)
+
+
+def build_model(algorithm, problem_type, n_jobs=None):
+    """Creates an unfitted estimator; ``n_jobs`` caps the threads of multi-threaded ones."""
+    cls = estimator_class(algorithm, problem_type)
+    _, _, _, threaded, classifier_kwargs = ESTIMATORS[algorithm]
+    kwargs = dict(classifier_kwargs) if problem_type == "classification" else {}
+    if threaded:
+        kwargs["n_jobs"] = n_jobs
+    return cls(**kwargs)
+
+
+def estimator_modules(algorithms=None):
+    return sorted({ESTIMATORS[alg][0] for alg in (algorithms or ALGORITHMS)})
+
+
+def warm_up(algorithms=None):
+    """Imports the estimator modules of ``algorithms`` (all by default) ahead of the first request.
+
+    Returns the seconds it took.
+    """
+    started_at = time.perf_counter()
+    for module in estimator_modules(algorithms):
+        importlib.import_module(module)
+    return time.perf_counter() - started_at
@@ -1,13 +1,26 @@
+import time
+IMPORT_STARTED_AT = time.perf_counter()  # Cold-start time is measured from here
+
 from fastapi import FastAPI, UploadFile, File, Form, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
 import pandas as pd
 import numpy as np
 import json
+import asyncio
 import io
+import os
 from io import StringIO
 from typing import Dict, Optional
-from model_training import train_model  # Import training functions
+from algorithms import ALGORITHMS, warm_up  # Estimators are imported on first use, not here
+from dataset_store import DatasetStore, DatasetNotFoundError
+from training_jobs import TrainingJobManager, QueueFullError, JobNotFoundError, ACTIVE_STATUSES
+from model_registry import ModelRegistry, ModelNotFoundError, read_batches, is_arrow_upload
+from dataset_profiling import DEFAULT_NA_VALUES
+from instrumentation import InstrumentationMiddleware, metrics, log_event
 
 app = FastAPI()
 
@@ -20,53 +33,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route request metrics and one structured log line (with stage timings) per request
+app.add_middleware(InstrumentationMiddleware)
+
 # Mount static directory for visualizations
 app.mount("/static", StaticFiles(directory="./static"), name="static")
 
+# Content-addressed cache of parsed uploads, shared by every endpoint
+dataset_store = DatasetStore()
+
+# Every model fitted by a job is kept here for /predict and /download-model/
+model_registry = ModelRegistry()
+
+# Process pool that runs training off the event loop
+training_jobs = TrainingJobManager(dataset_store.root, model_registry.root)
+JOB_STREAM_POLL_INTERVAL = 0.5
+
+# Optional warm-up: "all" or a comma-separated list of algorithms to import at start-up
+WARMUP_ALGORITHMS = os.environ.get("WARMUP_ALGORITHMS", "")
+startup_timings = {}
+
+
+@app.on_event("startup")
+async def record_startup():
+    """Logs how long the API took to become ready and starts the optional warm-up in the background."""
+    startup_timings["import_seconds"] = IMPORT_DONE_AT - IMPORT_STARTED_AT
+    if WARMUP_ALGORITHMS:
+        algorithms = None if WARMUP_ALGORITHMS == "all" else [
+            alg.strip() for alg in WARMUP_ALGORITHMS.split(",") if alg.strip() in ALGORITHMS
+        ]
+        # Training workers are started and import their estimators; this process warms up for /predict
+        training_jobs.warm_up(algorithms)
+        asyncio.get_running_loop().run_in_executor(None, warm_up_api_process, algorithms)
+    startup_timings["ready_seconds"] = time.perf_counter() - IMPORT_STARTED_AT
+    log_event("startup", **startup_timings)
+
+
+def warm_up_api_process(algorithms):
+    startup_timings["warm_up_seconds"] = warm_up(algorithms)
+    log_event("warm_up", algorithms=algorithms or ALGORITHMS, seconds=startup_timings["warm_up_seconds"])
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition: stage timings and peak memory, request latency, job counts."""
+    await run_in_threadpool(training_jobs.drain_stages)
+    for status, count in training_jobs.status_counts().items():
+        metrics.set("automl_training_jobs", count, {"status": status}, help="Training jobs by status.")
+    for phase, seconds in startup_timings.items():
+        metrics.set("automl_startup_seconds", seconds, {"phase": phase.replace("_seconds", "")},
+                    help="API cold-start timings.")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health")
+async def health():
+    """Liveness check; also reports the start-up timings."""
+    return {"status": "ok", "startup": startup_timings}
+
+
+@app.on_event("shutdown")
+def shutdown_training_jobs():
+    training_jobs.shutdown()
+
+
+async def resolve_dataset(file: Optional[UploadFile], dataset_id: Optional[str]) -> str:
+    """Returns the ID of a stored dataset, storing the uploaded file if one is given."""
+    if file is not None:
+        dataset_id, _ = await run_in_threadpool(dataset_store.put, file.file)
+        return dataset_id
+    if not dataset_id:
+        raise HTTPException(status_code=400, detail="Either a file or a dataset_id is required.")
+    if not dataset_store.contains(dataset_id):
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found. Please upload it again.")
+    return dataset_id
+
 
 @app.post("/upload-dataset/")
 async def upload_dataset(file: UploadFile = File(...)):
     """Handles dataset upload and provides an overview."""
     try:
-        contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode("utf-8")), na_values=["?", "NA", "N/A", "None", "null", "", "undefined"])
-
-        if df.empty:
-            raise ValueError("Dataset is empty after loading.")
-
-        column_details = []
-        for col in df.columns:
-            col_type = "categorical" if df[col].dtype == "object" else "numeric"
-            missing_count = int(df[col].isnull().sum())
-            missing_percent = round((missing_count / len(df)) * 100, 2)
-
-            # Sample row with missing value
-            sample_missing_row = None
-            if missing_count > 0:
-                missing_index = df[df[col].isnull()].index[0]
-                sample_row = df.iloc[missing_index].replace({np.nan: "NaN", "?": "?", "": "Empty", None: "Null"}).to_dict()
-                sample_missing_row = str(sample_row)
-
-            stats = {
-                "min": df[col].min() if col_type == "numeric" else None,
-                "max": df[col].max() if col_type == "numeric" else None,
-                "mean": df[col].mean() if col_type == "numeric" else None,
-                "std_dev": df[col].std() if col_type == "numeric" else None,
-                "median": df[col].median() if col_type == "numeric" else None,
-                "unique_values": df[col].nunique() if col_type == "categorical" else None,
-                "most_common": df[col].mode()[0] if col_type == "categorical" and not df[col].mode().empty else "N/A",
-            }
-
-            column_details.append({
-                "name": col,
-                "type": col_type,
-                "missing_values": missing_count,
-                "missing_percent": missing_percent,
-                "stats": stats,
-                "sample_missing_row": sample_missing_row
-            })
-
-        return {"num_rows": len(df), "num_columns": len(df.columns), "column_details": column_details}
+        # ✅ Hash the upload; only content the store hasn't seen is parsed and profiled
+        dataset_id, overview = await run_in_threadpool(dataset_store.put, file.file)
+        return {**overview, "dataset_id": dataset_id}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Dataset upload failed: {str(e)}")
@@ -74,7 +123,8 @@ async def upload_dataset(file: UploadFile = File(...)):
 
 @app.post("/automl/")
 async def automl_pipeline(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Form(None),  # ID returned by /upload-dataset/, instead of re-uploading
     target_column: str = Form(...),
     algorithm: str = Form(...),
     hyperparameters: str = Form("{}"),  # Default to empty JSON object
@@ -92,9 +142,11 @@ async def automl_pipeline(
         except json.JSONDecodeError as e:
             raise HTTPException(status_code=400, detail=f"Invalid JSON in hyperparameters: {str(e)}")
 
-        print(f"✅ Received Hyperparameters: {hyperparameters_dict}")  # Debugging log
+        log_event("automl_request", hyperparameters=hyperparameters_dict)
+
+        dataset_id = await resolve_dataset(file, dataset_id)
 
-        return {"message": "Dataset processed successfully", "parsed_hyperparameters": hyperparameters_dict}
+        return {"message": "Dataset processed successfully", "dataset_id": dataset_id, "parsed_hyperparameters": hyperparameters_dict}
         
         # ✅ Read dataset, specifying missing values
         missing_values_list = ["NA", "N/A", "None", "null", ""]  # Default missing values
@@ -119,11 +171,217 @@ async def automl_pipeline(
             "num_missing_values_after_processing": df.isnull().sum().sum(),
         }
 
+    except HTTPException:
+        raise
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=400, detail=f"Invalid JSON in hyperparameters: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AutoML pipeline failed: {str(e)}")
 
+
+@app.post("/jobs", status_code=202)
+async def submit_training_job(
+    file: Optional[UploadFile] = File(None),
+    dataset_id: Optional[str] = Form(None),
+    target_column: str = Form(...),
+    algorithm: Optional[str] = Form(None),
+    algorithms: Optional[str] = Form(None),  # "all" or a JSON list: compare several algorithms in one job
+    time_budget: Optional[float] = Form(None),  # Seconds each compared model may spend fitting
+    hyperparameters: str = Form("{}"),
+    missing_value_strategy: str = Form("median"),
+    scaling_strategy: str = Form("standard"),
+    auto_tune: bool = Form(False),
+    tuning_time_budget: Optional[float] = Form(None),  # Soft limit on seconds for the auto_tune search plus refit
+    max_trials: Optional[int] = Form(None),  # Candidates sampled by the auto_tune search
+    generate_visualization: bool = Form(False),
+    missing_value_symbol: str = Form("NaN")
+):
+    """Queues a training run (or a multi-algorithm comparison) on the worker pool and returns its job ID."""
+    try:
+        hyperparameters_dict = json.loads(hyperparameters)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON in hyperparameters: {str(e)}")
+    if not isinstance(hyperparameters_dict, dict):
+        raise HTTPException(status_code=400, detail="Hyperparameters must be a JSON object of parameter names to values.")
+
+    if algorithms is not None:
+        try:
+            algorithms = ALGORITHMS if algorithms == "all" else json.loads(algorithms)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON in algorithms: {str(e)}")
+        if not isinstance(algorithms, list):
+            raise HTTPException(status_code=400, detail="Algorithms must be \"all\" or a JSON list of algorithm names.")
+        unknown = [alg for alg in algorithms if alg not in ALGORITHMS]
+        if not algorithms or unknown:
+            raise HTTPException(status_code=400, detail=f"Invalid algorithms {unknown or algorithms}. Choose from {ALGORITHMS}.")
+        duplicates = sorted({alg for alg in algorithms if algorithms.count(alg) > 1})
+        if duplicates:
+            # Each algorithm's result is keyed by its name
+            raise HTTPException(status_code=400, detail=f"Algorithms listed more than once: {duplicates}.")
+    elif not algorithm:
+        raise HTTPException(status_code=400, detail="Either algorithm or algorithms is required.")
+    elif algorithm not in ALGORITHMS:
+        raise HTTPException(status_code=400, detail=f"Invalid algorithm '{algorithm}'. Choose from {ALGORITHMS}.")
+
+    dataset_id = await resolve_dataset(file, dataset_id)
+    columns = [column["name"] for column in dataset_store.get_profile(dataset_id)["column_details"]]
+    if target_column not in columns:
+        raise HTTPException(status_code=400, detail=f"Target column '{target_column}' not found in dataset.")
+
+    try:
+        # Job manager calls block on IPC (and the first one starts the worker pool): keep them off the event loop
+        job = await run_in_threadpool(training_jobs.submit, {
+            "dataset_id": dataset_id,
+            "target_column": target_column,
+            "algorithm": algorithm,
+            "algorithms": algorithms,
+            "time_budget": time_budget,
+            "hyperparameters": hyperparameters,
+            "missing_value_strategy": missing_value_strategy,
+            "scaling_strategy": scaling_strategy,
+            "auto_tune": auto_tune,
+            "tuning_time_budget": tuning_time_budget,
+            "max_trials": max_trials,
+            "generate_visualization": generate_visualization,
+            "missing_value_symbol": missing_value_symbol,
+        })
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+    return await run_in_threadpool(training_jobs.status, job.job_id)
+
+
+@app.get("/jobs/{job_id}")
+async def get_training_job(job_id: str):
+    """Returns a job's status, current stage and progress fraction."""
+    try:
+        return await run_in_threadpool(training_jobs.status, job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_training_job_result(job_id: str):
+    """Returns the training result once the job has succeeded."""
+    try:
+        job = training_jobs.result(job_id)
+        status = await run_in_threadpool(training_jobs.status, job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+
+    if job is None:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is still {status['status']}.")
+    if job.result is None:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' {status['status']}: {job.error or 'no result'}")
+    return {**status, "result": job.result}
+
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_training_job(job_id: str):
+    """Streams newline-delimited JSON: one line per model result as it finishes, then the final status."""
+    try:
+        await run_in_threadpool(training_jobs.status, job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+
+    async def events():
+        sent = 0
+        while True:
+            status = await run_in_threadpool(training_jobs.status, job_id)
+            for result in status["results"][sent:]:
+                yield json.dumps(jsonable_encoder(result)) + "\n"
+            sent = len(status["results"])
+            if status["status"] not in ACTIVE_STATUSES:
+                status.pop("results")
+                yield json.dumps(jsonable_encoder(status)) + "\n"
+                return
+            await asyncio.sleep(JOB_STREAM_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_training_job(job_id: str):
+    """Cancels a queued job, or stops a running one (its fitting processes are terminated) within about a second."""
+    try:
+        await run_in_threadpool(training_jobs.cancel, job_id)
+        return await run_in_threadpool(training_jobs.status, job_id)
+    except JobNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+
+
+@app.get("/models")
+async def list_models():
+    """Lists the stored models, newest first."""
+    return await run_in_threadpool(model_registry.list_models)
+
+
+@app.get("/models/{model_id}")
+async def get_model(model_id: str):
+    """Returns a stored model's metadata (algorithm, features, metrics)."""
+    try:
+        return model_registry.get_meta(model_id)
+    except ModelNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model '{model_id}' not found.")
+
+
+@app.get("/download-model/")
+async def download_model(model_id: Optional[str] = None):
+    """Downloads a model with its preprocessing pipeline as a joblib file (the latest model by default)."""
+    model_id = model_id or model_registry.latest()
+    if not model_id or not model_registry.contains(model_id):
+        raise HTTPException(status_code=404, detail="No trained model found. Please train a model first.")
+    algorithm = model_registry.get_meta(model_id)["algorithm"].lower().replace(" ", "_")
+    return FileResponse(model_registry.model_path(model_id), media_type="application/octet-stream",
+                        filename=f"{algorithm}_{model_id}.joblib")
+
+
+@app.post("/predict")
+async def predict(
+    file: UploadFile = File(...),  # CSV, or an Arrow IPC file/stream (.arrow/.feather/.ipc)
+    model_id: str = Form(...),
+    include_probabilities: bool = Form(False),  # Add one probability_<class> column per class
+    missing_value_symbol: Optional[str] = Form(None)
+):
+    """Scores a batch of rows with a stored model, streaming the predictions back as CSV.
+
+    Rows are read, preprocessed and predicted one chunk at a time, so memory
+    stays flat however many rows are sent.
+    """
+    try:
+        model = await run_in_threadpool(model_registry.load, model_id)
+    except ModelNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model '{model_id}' not found.")
+
+    na_values = DEFAULT_NA_VALUES
+    if missing_value_symbol and missing_value_symbol.strip() and missing_value_symbol not in na_values:
+        na_values = na_values + [missing_value_symbol]
+    batches = read_batches(file.file, model.feature_names, model.categorical_features,
+                           arrow=is_arrow_upload(file.filename, file.content_type), na_values=na_values)
+    predictions = model.predict_batches(batches, include_probabilities)
+
+    # ✅ Score the first chunk before responding, so bad input still gets a proper error status
+    try:
+        first = await run_in_threadpool(next, predictions, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Prediction failed: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read the prediction batch: {str(e)}")
+
+    def rows():
+        if first is None:
+            yield "prediction\n"
+            return
+        yield first.to_csv(index=False)
+        for chunk in predictions:
+            yield chunk.to_csv(index=False, header=False)
+
+    return StreamingResponse(rows(), media_type="text/csv",
+                             headers={"Content-Disposition": f"attachment; filename=predictions_{model_id}.csv"})
+
+
+IMPORT_DONE_AT = time.perf_counter()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8080, timeout_keep_alive=120)
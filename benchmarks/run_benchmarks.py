@@ -0,0 +1,268 @@
+"""Scaling benchmarks for the AutoML API.
+
+Generates LIR-like datasets (see ``synthetic_data``) for every rows x width
+combination, then drives a running API with each of them:
+
+* ``POST /upload-dataset/`` twice: a cold upload (profiling + Arrow
+  conversion) and a repeat upload (content-hash cache hit);
+* one ``POST /jobs`` training job per algorithm, polled until it finishes,
+  with the per-stage timings and peak memory returned by the job;
+* ``POST /predict`` with the trained model over the same file.
+
+Server-side stage timings of the uploads come from the difference of the
+``/metrics`` stage counters before and after each upload, so run the suite
+against a server that nothing else is using. Results are written as JSON.
+
+Usage (start the API first, e.g. ``python automl_api.py``)::
+
+    python benchmarks/run_benchmarks.py --rows 1e4,1e5 --widths 16,64
+    python benchmarks/run_benchmarks.py --rows 1e7 --algorithms "Random Forest,XGBoost"
+
+10^7-row files are several hundred MB to a few GB; raise the server's
+``DATASET_STORE_MAX_BYTES`` accordingly. Algorithms that cannot finish at a
+size in reasonable time (``ROW_LIMITS``) are recorded as ``skipped`` unless
+``--no-row-limits`` is given.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+import requests
+from synthetic_data import TARGET_COLUMN, dataset_path, fit_lir, generate
+
+ALGORITHMS = ["Random Forest", "Gradient Boosting", "XGBoost", "SVM", "KNN"]
+DEFAULT_ROWS = [10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+DEFAULT_WIDTHS = [16, 64]
+
+# Largest training set each algorithm is run on by default (kernel SVM is quadratic, KNN predicts by brute force)
+ROW_LIMITS = {"SVM": 10 ** 5, "KNN": 10 ** 6, "Gradient Boosting": 10 ** 6}
+
+POLL_INTERVAL = 1.0
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    session = requests.Session()
+    health = session.get(f"{args.url}/health", timeout=30).json()
+    lir_model = fit_lir()
+
+    records = []
+    for rows in args.rows:
+        for width in args.widths:
+            path = dataset_path(args.data_dir, rows, width, args.missing_rate, args.seed)
+            started_at = time.perf_counter()
+            generate(path, rows, width, args.missing_rate, args.seed, model=lir_model)
+            print(f"== {rows} rows x {width} columns ({os.path.getsize(path) / 1e6:.1f} MB, "
+                  f"generated in {time.perf_counter() - started_at:.1f}s)")
+            for repeat in range(args.repeat):
+                records.extend(run_dataset(session, args, path, rows, width, repeat))
+
+    output = {
+        "started_at": args.started_at,
+        "environment": environment(health),
+        "settings": {k: v for k, v in vars(args).items() if k != "started_at"},
+        "records": records,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+def run_dataset(session, args, path, rows, width, repeat):
+    base = {"rows": rows, "width": width, "repeat": repeat}
+    records = []
+
+    for phase in ("upload", "upload_cached"):
+        before = stage_totals(session, args.url)
+        started_at = time.perf_counter()
+        response = post_file(session, f"{args.url}/upload-dataset/", path, {})
+        seconds = time.perf_counter() - started_at
+        if response.status_code != 200:
+            raise RuntimeError(f"Upload of {path} failed: {response.status_code} {response.text}")
+        overview = response.json()
+        records.append(report({**base, "endpoint": phase, "status": response.status_code, "seconds": seconds,
+                               "rows_per_second": rows / seconds,
+                               "stages": stage_delta(before, stage_totals(session, args.url))}))
+    dataset_id = overview["dataset_id"]
+
+    for algorithm in args.algorithms:
+        if not args.no_row_limits and rows > ROW_LIMITS.get(algorithm, float("inf")):
+            records.append(report({**base, "endpoint": "train", "algorithm": algorithm, "status": "skipped"}))
+            continue
+        train = run_training(session, args, dataset_id, algorithm)
+        records.append(report({**base, "endpoint": "train", **train}))
+        if train["status"] == "succeeded" and not args.skip_predict:
+            records.append(report({**base, "endpoint": "predict", **run_prediction(session, args, path, rows, train)}))
+    return records
+
+
+def run_training(session, args, dataset_id, algorithm):
+    started_at = time.perf_counter()
+    response = session.post(f"{args.url}/jobs", data={
+        "dataset_id": dataset_id, "target_column": TARGET_COLUMN, "algorithm": algorithm,
+        "missing_value_strategy": args.missing_value_strategy, "scaling_strategy": args.scaling_strategy,
+    }, timeout=60)
+    if response.status_code != 202:
+        return {"algorithm": algorithm, "status": f"http_{response.status_code}", "error": response.text}
+    job_id = response.json()["job_id"]
+
+    while True:
+        status = session.get(f"{args.url}/jobs/{job_id}", timeout=30).json()
+        if status["status"] not in ACTIVE_STATUSES:
+            break
+        if time.perf_counter() - started_at > args.job_timeout:
+            session.delete(f"{args.url}/jobs/{job_id}", timeout=30)
+            return {"algorithm": algorithm, "job_id": job_id, "status": "timeout", "seconds": time.perf_counter() - started_at}
+        time.sleep(POLL_INTERVAL)
+    seconds = time.perf_counter() - started_at
+
+    record = {"algorithm": algorithm, "job_id": job_id, "status": status["status"], "seconds": seconds, "error": status["error"]}
+    if status["status"] == "succeeded":
+        result = session.get(f"{args.url}/jobs/{job_id}/result", timeout=60).json()["result"]
+        record.update({
+            "model_id": result.get("model_id"),
+            "accuracy": result["metrics"].get("accuracy"),
+            "stages": summarize(result.get("stages", [])),
+        })
+    return record
+
+
+def run_prediction(session, args, path, rows, train):
+    before = stage_totals(session, args.url)
+    started_at = time.perf_counter()
+    response = post_file(session, f"{args.url}/predict", path, {"model_id": train["model_id"]}, stream=True)
+    first_byte = None
+    lines = 0
+    for block in response.iter_content(chunk_size=UPLOAD_BLOCK_SIZE):
+        first_byte = first_byte or time.perf_counter() - started_at
+        lines += block.count(b"\n")
+    seconds = time.perf_counter() - started_at
+    return {
+        "algorithm": train["algorithm"],
+        "model_id": train["model_id"],
+        "status": response.status_code,
+        "seconds": seconds,
+        "time_to_first_byte": first_byte,
+        "rows_per_second": rows / seconds,
+        "predicted_rows": max(0, lines - 1),
+        "stages": stage_delta(before, stage_totals(session, args.url)),
+    }
+
+
+def post_file(session, url, path, fields, stream=False):
+    """Multipart POST that streams the file from disk instead of loading it into memory."""
+    boundary = uuid.uuid4().hex
+
+    def body():
+        for name, value in fields.items():
+            yield (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n').encode("utf-8")
+        yield (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+               f"Content-Type: text/csv\r\n\r\n").encode("utf-8")
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(UPLOAD_BLOCK_SIZE), b""):
+                yield block
+        yield f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+    return session.post(url, data=body(), headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+                        stream=stream, timeout=None)
+
+
+def stage_totals(session, url):
+    """``{stage: (seconds, count)}`` from the server's ``/metrics`` stage histogram."""
+    totals = {}
+    for line in session.get(f"{url}/metrics", timeout=30).text.splitlines():
+        for suffix, index in (("_sum", 0), ("_count", 1)):
+            prefix = f"automl_stage_duration_seconds{suffix}{{stage=\""
+            if line.startswith(prefix):
+                name = line[len(prefix):line.index('"', len(prefix))]
+                totals.setdefault(name, [0.0, 0])[index] = float(line.rsplit(" ", 1)[1])
+    return totals
+
+
+def stage_delta(before, after):
+    delta = {}
+    for name, (seconds, count) in after.items():
+        prev_seconds, prev_count = before.get(name, (0.0, 0))
+        if count > prev_count:
+            delta[name] = {"seconds": seconds - prev_seconds, "calls": int(count - prev_count)}
+    return delta
+
+
+def summarize(stages):
+    summary = {}
+    for record in stages:
+        entry = summary.setdefault(record["stage"], {"seconds": 0.0, "calls": 0, "peak_memory_bytes": None})
+        entry["seconds"] += record["seconds"]
+        entry["calls"] += 1
+        if record.get("peak_memory_bytes") is not None:
+            entry["peak_memory_bytes"] = max(entry["peak_memory_bytes"] or 0, record["peak_memory_bytes"])
+    return summary
+
+
+def report(record):
+    parts = [f"{record['endpoint']:<14}", f"{record.get('algorithm', ''):<18}", f"{record['status']!s:<10}"]
+    if record.get("seconds") is not None:
+        parts.append(f"{record['seconds']:8.2f}s")
+    if record.get("rows_per_second"):
+        parts.append(f"{record['rows_per_second']:12,.0f} rows/s")
+    if record.get("accuracy") is not None:
+        parts.append(f"acc={record['accuracy']:.3f}")
+    print("  " + " ".join(parts))
+    return record
+
+
+def environment(health):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=BENCH_DIR).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "server_startup": health.get("startup"),
+    }
+
+
+def parse_args(argv):
+    def int_list(value):
+        return [int(float(v)) for v in value.split(",") if v]
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8080", help="Base URL of a running API")
+    parser.add_argument("--rows", type=int_list, default=DEFAULT_ROWS, help="Comma-separated row counts, e.g. 1e4,1e5")
+    parser.add_argument("--widths", type=int_list, default=DEFAULT_WIDTHS, help="Comma-separated attribute counts")
+    parser.add_argument("--algorithms", type=lambda v: [a.strip() for a in v.split(",")], default=ALGORITHMS)
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Fraction of attribute cells written as '?'")
+    parser.add_argument("--missing-value-strategy", default="median")
+    parser.add_argument("--scaling-strategy", default="standard")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--job-timeout", type=float, default=1800.0, help="Seconds before a training job is cancelled")
+    parser.add_argument("--no-row-limits", action="store_true", help="Run every algorithm at every size")
+    parser.add_argument("--skip-predict", action="store_true")
+    parser.add_argument("--data-dir", default=os.path.join(BENCH_DIR, "data"))
+    parser.add_argument("--output", default=None, help="Results JSON (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    unknown = [alg for alg in args.algorithms if alg not in ALGORITHMS]
+    if unknown:
+        parser.error(f"Unknown algorithm(s) {unknown}. Choose from {ALGORITHMS}.")
+    args.started_at = time.strftime("%Y%m%dT%H%M%S")
+    args.output = args.output or os.path.join(BENCH_DIR, "results", f"{args.started_at}.json")
+    args.url = args.url.rstrip("/")
+    return args
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Synthetic datasets shaped like ``LIR.csv`` for the scaling benchmarks.
+
+``LIR.csv`` has 16 integer attributes in [0, 15] and a letter class. Each
+class's prior and per-attribute mean/std are taken from it; rows are drawn
+from those per-class distributions, so the classes stay about as separable
+as in the real data. Wider datasets add noisy copies of the 16 base
+attributes. Output is deterministic for a given ``seed``.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+LIR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "LIR.csv")
+TARGET_COLUMN = "class"
+CHUNK_ROWS = 500_000
+EXTRA_COLUMN_NOISE = 2.0
+
+
+def fit_lir(path=LIR_PATH):
+    """Per-class prior, mean and std of every LIR attribute."""
+    df = pd.read_csv(path)
+    features = [col for col in df.columns if col != TARGET_COLUMN]
+    grouped = df.groupby(TARGET_COLUMN)[features]
+    return {
+        "features": features,
+        "classes": grouped.size().index.to_numpy(),
+        "prior": (grouped.size() / len(df)).to_numpy(),
+        "mean": grouped.mean().to_numpy(),
+        "std": grouped.std().fillna(0).to_numpy(),
+    }
+
+
+def dataset_path(data_dir, rows, width, missing_rate=0.0, seed=42):
+    suffix = f"_missing{missing_rate:g}" if missing_rate else ""
+    return os.path.join(data_dir, f"lir_{rows}x{width}{suffix}_seed{seed}.csv")
+
+
+def generate(path, rows, width=16, missing_rate=0.0, seed=42, model=None):
+    """Writes ``rows`` synthetic rows with ``width`` attributes (plus the class) to ``path``.
+
+    Rows are generated and written ``CHUNK_ROWS`` at a time, so 10^7-row files
+    need little memory. ``missing_rate`` of the attribute cells are written as
+    ``?``, LIR's missing-value marker. An existing file is reused.
+    """
+    if os.path.exists(path):
+        return path
+    model = model or fit_lir()
+    n_base = len(model["features"])
+    rng = np.random.default_rng(seed)
+    columns = [f"attr{i + 1}" for i in range(width)]
+    tmp = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    with open(tmp, "w", newline="") as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, rows - start)
+            labels = rng.choice(len(model["classes"]), size=n, p=model["prior"])
+            base = rng.normal(model["mean"][labels], model["std"][labels])
+            # Columns past the 16 LIR attributes are noisy copies of them
+            source = base[:, np.arange(width) % n_base]
+            noise = rng.normal(0.0, EXTRA_COLUMN_NOISE, size=source.shape)
+            noise[:, :min(width, n_base)] = 0.0
+            values = np.clip(np.rint(source + noise), 0, 15).astype("int64")
+
+            chunk = pd.DataFrame(values, columns=columns)
+            if missing_rate:
+                chunk = chunk.astype(object).mask(rng.random(chunk.shape) < missing_rate, "?")
+            chunk[TARGET_COLUMN] = model["classes"][labels]
+            chunk.to_csv(f, index=False, header=start == 0)
+
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,334 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Tokens treated as missing when profiling an uploaded dataset
+DEFAULT_NA_VALUES = ["?", "NA", "N/A", "None", "null", "", "undefined"]
+
+# Target number of cells parsed per chunk; rows per chunk shrink as files get wider
+CHUNK_CELLS = 2_000_000
+MIN_CHUNK_ROWS = 1_000
+
+# Sketch sizes: below these limits the statistics are exact
+MEDIAN_SAMPLE_SIZE = 32_768
+MAX_TRACKED_VALUES = 50_000
+DISTINCT_SKETCH_SIZE = 4_096
+
+
+class QuantileSample:
+    """Bottom-k priority sample of a numeric column, used for the median.
+
+    Every value gets a random priority and only the ``size`` values with the
+    smallest priorities are kept, so two samples merge by concatenation.
+    While fewer than ``size`` values have been seen the median is exact.
+    """
+
+    def __init__(self, rng, size=MEDIAN_SAMPLE_SIZE):
+        self.rng = rng
+        self.size = size
+        self.seen = 0
+        self.values = np.empty(0, dtype="float64")
+        self.keys = np.empty(0, dtype="float64")
+
+    def update(self, values):
+        if len(values) == 0:
+            return
+        self.seen += len(values)
+        values = np.concatenate([self.values, values])
+        keys = np.concatenate([self.keys, self.rng.random(len(values) - len(self.values))])
+        if len(values) > self.size:
+            keep = np.argpartition(keys, self.size)[:self.size]
+            values, keys = values[keep], keys[keep]
+        self.values, self.keys = values, keys
+
+    def median(self):
+        return float(np.median(self.values)) if self.seen else np.nan
+
+
+class FrequencySketch:
+    """Value counts of a categorical column with a bounded number of entries.
+
+    Counts are exact until more than ``capacity`` distinct values show up;
+    after that only the most frequent values are kept (top-k) and the number
+    of distinct values is estimated with a k-minimum-values hash sketch.
+    """
+
+    def __init__(self, capacity=MAX_TRACKED_VALUES, distinct_k=DISTINCT_SKETCH_SIZE):
+        self.capacity = capacity
+        self.distinct_k = distinct_k
+        self.counts = pd.Series(dtype="int64")
+        self.truncated = False
+        self.hashes = np.empty(0, dtype="uint64")
+
+    def update(self, value_counts):
+        if value_counts.empty:
+            return
+        if self.truncated:
+            self._add_hashes(value_counts.index)
+        if self.counts.empty:
+            self.counts = value_counts.astype("int64")
+        else:
+            self.counts = self.counts.add(value_counts, fill_value=0).astype("int64")
+        if len(self.counts) > self.capacity:
+            if not self.truncated:
+                self._add_hashes(self.counts.index)
+                self.truncated = True
+            self.counts = self.counts.nlargest(self.capacity)
+
+    def _add_hashes(self, index):
+        hashes = pd.util.hash_array(index.to_numpy())
+        self.hashes = np.unique(np.concatenate([self.hashes, hashes]))[:self.distinct_k]
+
+    def unique_values(self):
+        if not self.truncated or len(self.hashes) < self.distinct_k:
+            return max(len(self.counts), len(self.hashes))
+        estimate = (self.distinct_k - 1) * 2.0 ** 64 / float(self.hashes[-1])
+        return max(len(self.counts), int(round(estimate)))
+
+    def most_common(self):
+        """Most frequent value; ties resolve to the smallest value like ``Series.mode``."""
+        if self.counts.empty:
+            return "N/A"
+        top = self.counts.index[self.counts.to_numpy() == self.counts.max()]
+        try:
+            return sorted(top)[0]
+        except TypeError:
+            return top[0]
+
+
+class DatasetProfiler:
+    """Mergeable per-column accumulators fed one parsed chunk at a time.
+
+    Numeric statistics are updated for all numeric columns of a chunk at once
+    on a 2-D array and merged with Chan's parallel mean/variance formula.
+    """
+
+    def __init__(self, columns, seed=0):
+        self.columns = list(columns)
+        width = len(self.columns)
+        self.num_rows = 0
+        self.missing = np.zeros(width, dtype="int64")
+        self.first_missing_row = [None] * width
+        self.count = np.zeros(width, dtype="int64")
+        self.mean = np.zeros(width, dtype="float64")
+        self.m2 = np.zeros(width, dtype="float64")
+        self.min = np.full(width, np.nan)
+        self.max = np.full(width, np.nan)
+        self.kinds = [set() for _ in range(width)]
+        self.categorical = np.zeros(width, dtype=bool)
+        # Columns that turned categorical after numeric values were seen need a re-read
+        self.reparse = set()
+        rng = np.random.default_rng(seed)
+        self.samples = [QuantileSample(rng) for _ in range(width)]
+        self.frequencies = [FrequencySketch() for _ in range(width)]
+
+    def update(self, chunk):
+        isnull = chunk.isna().to_numpy()
+        missing = isnull.sum(axis=0)
+        for pos in np.flatnonzero(missing):
+            if self.first_missing_row[pos] is None:
+                # A one-row copy (a slice would keep the whole chunk alive), rendered once final dtypes are known
+                row = int(isnull[:, pos].argmax())
+                self.first_missing_row[pos] = chunk.iloc[row:row + 1].copy(deep=True)
+        self.missing += missing
+        self.num_rows += len(chunk)
+
+        numeric_pos = []
+        for pos, dtype in enumerate(chunk.dtypes):
+            if _is_numeric(dtype) and not self.categorical[pos]:
+                numeric_pos.append(pos)
+                self.kinds[pos].add(dtype.kind)
+                continue
+            if not self.categorical[pos] and self.count[pos] > 0:
+                self.reparse.add(pos)
+            self.categorical[pos] = True
+            if pos not in self.reparse:
+                self.frequencies[pos].update(chunk.iloc[:, pos].value_counts())
+
+        if numeric_pos:
+            block = np.asfortranarray(chunk.iloc[:, numeric_pos].to_numpy(dtype="float64", na_value=np.nan))
+            self._update_numeric(np.asarray(numeric_pos), block)
+
+    def _update_numeric(self, positions, block):
+        mask = ~np.isnan(block)
+        count = mask.sum(axis=0)
+        filled = np.where(mask, block, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = filled.sum(axis=0) / count
+            m2 = (np.where(mask, mean - block, 0.0) ** 2).sum(axis=0)
+        low = np.where(mask, block, np.inf).min(axis=0)
+        high = np.where(mask, block, -np.inf).max(axis=0)
+        seen = count > 0
+
+        total = self.count[positions] + count
+        delta = mean - self.mean[positions]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            merged_mean = self.mean[positions] + delta * count / total
+            merged_m2 = self.m2[positions] + m2 + delta ** 2 * self.count[positions] * count / total
+        first = self.count[positions] == 0
+        self.mean[positions] = np.where(seen, np.where(first, mean, merged_mean), self.mean[positions])
+        self.m2[positions] = np.where(seen, np.where(first, m2, merged_m2), self.m2[positions])
+        self.count[positions] = total
+        self.min[positions] = np.fmin(self.min[positions], np.where(seen, low, np.nan))
+        self.max[positions] = np.fmax(self.max[positions], np.where(seen, high, np.nan))
+
+        for j, pos in enumerate(positions):
+            if seen[j]:
+                self.samples[pos].update(block[mask[:, j], j])
+
+    def update_categorical(self, chunk):
+        """Feed a chunk of re-read (string typed) columns into their frequency sketches."""
+        for col in chunk.columns:
+            self.frequencies[self.columns.index(col)].update(chunk[col].value_counts())
+
+    def column_details(self):
+        details = []
+        dtypes, row_dtype = self._final_dtypes()
+        for pos, col in enumerate(self.columns):
+            missing_count = int(self.missing[pos])
+            if self.categorical[pos]:
+                col_type = "categorical"
+                frequencies = self.frequencies[pos]
+                stats = {
+                    "min": None,
+                    "max": None,
+                    "mean": None,
+                    "std_dev": None,
+                    "median": None,
+                    "unique_values": frequencies.unique_values(),
+                    "most_common": _native(frequencies.most_common()),
+                }
+            else:
+                col_type = "numeric"
+                count = self.count[pos]
+                stats = {
+                    "min": self._extreme(pos, self.min[pos]),
+                    "max": self._extreme(pos, self.max[pos]),
+                    "mean": _native(self.mean[pos] if count else np.nan),
+                    "std_dev": _native(np.sqrt(self.m2[pos] / (count - 1)) if count > 1 else np.nan),
+                    "median": _native(self.samples[pos].median()),
+                    "unique_values": None,
+                    "most_common": "N/A",
+                }
+
+            details.append({
+                "name": col,
+                "type": col_type,
+                "missing_values": missing_count,
+                "missing_percent": round((missing_count / self.num_rows) * 100, 2),
+                "stats": stats,
+                "sample_missing_row": self._sample_row(self.first_missing_row[pos], dtypes, row_dtype),
+            })
+        return details
+
+    def _sample_row(self, frame, dtypes, row_dtype):
+        """Render a stored row with each value in the dtype a whole-file parse gives its column."""
+        if frame is None:
+            return None
+        values = [_CASTS.get(dtype, _as_text)(value) for value, dtype in zip(frame.to_numpy(dtype=object)[0], dtypes)]
+        row = pd.Series(values, index=frame.columns, dtype=row_dtype)
+        return str(row.replace({np.nan: "NaN", "?": "?", "": "Empty", None: "Null"}).to_dict())
+
+    def _final_dtypes(self):
+        """Per-column dtype of a whole-file parse, and the dtype of one of its rows."""
+        dtypes = []
+        for pos in range(len(self.columns)):
+            kinds = self.kinds[pos]
+            if self.categorical[pos]:
+                dtypes.append("text")
+            elif self.missing[pos] and kinds <= {"b"}:
+                dtypes.append("object")
+            elif self.missing[pos] or not kinds <= {"i", "u", "b"}:
+                dtypes.append("float64")
+            else:
+                dtypes.append("bool" if kinds == {"b"} else "int64")
+        distinct = set(dtypes)
+        if len(distinct) == 1 and "text" not in distinct:
+            row_dtype = dtypes[0]
+        elif distinct <= {"int64", "float64"}:
+            row_dtype = "float64"
+        else:
+            row_dtype = object
+        return dtypes, row_dtype
+
+    def _extreme(self, pos, value):
+        """Report min/max in the column's own dtype, as a whole-file parse would."""
+        if np.isnan(value):
+            return None
+        kinds = self.kinds[pos]
+        if kinds <= {"i", "u"}:
+            return int(value)
+        if kinds == {"b"}:
+            return bool(value)
+        return float(value)
+
+
+def profile_csv(source, na_values=DEFAULT_NA_VALUES, chunksize=None):
+    """Profile a CSV file in bounded memory and a single vectorized pass.
+
+    ``source`` is a path or a seekable binary file object. The file is parsed in
+    chunks of roughly ``CHUNK_CELLS`` cells, so memory stays flat however many
+    rows it has. Returns the overview served by ``/upload-dataset/``.
+    """
+    columns = _read_csv(source, na_values, nrows=0).columns
+    if chunksize is None:
+        chunksize = default_chunksize(len(columns))
+
+    profiler = DatasetProfiler(columns)
+    with _read_csv(source, na_values, chunksize=chunksize) as reader:
+        for chunk in reader:
+            profiler.update(chunk)
+
+    if profiler.num_rows == 0 or len(columns) == 0:
+        raise ValueError("Dataset is empty after loading.")
+
+    if profiler.reparse:
+        # Rare: a column parsed as numeric in early chunks and as text later on
+        usecols = [columns[pos] for pos in sorted(profiler.reparse)]
+        with _read_csv(source, na_values, chunksize=chunksize, usecols=usecols, dtype=str) as reader:
+            for chunk in reader:
+                profiler.update_categorical(chunk)
+
+    return {
+        "num_rows": profiler.num_rows,
+        "num_columns": len(columns),
+        "column_details": profiler.column_details(),
+    }
+
+
+def default_chunksize(num_columns):
+    """Rows per parsed chunk for a file with ``num_columns`` columns."""
+    return max(MIN_CHUNK_ROWS, CHUNK_CELLS // max(num_columns, 1))
+
+
+def _read_csv(source, na_values, **kwargs):
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+    return pd.read_csv(source, na_values=na_values, **kwargs)
+
+
+def _is_numeric(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)
+
+
+def _as_float(value):
+    return np.nan if pd.isna(value) else float(value)
+
+
+_CASTS = {"float64": _as_float, "int64": int, "bool": bool, "object": lambda value: value}
+
+
+def _as_text(value):
+    """Numbers parsed from a column that turned out textual go back to text, as a whole-file parse keeps them."""
+    if isinstance(value, (bool, np.bool_, str)) or pd.isna(value):
+        return value
+    return str(value)
+
+
+def _native(value):
+    """Convert numpy scalars to plain Python values; NaN becomes ``None``."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from dataset_profiling import DEFAULT_NA_VALUES, default_chunksize, profile_csv
+from disk_cache import evict_lru, valid_id
+from instrumentation import stage
+
+# Where uploaded datasets are cached and how much disk they may use
+DATASET_STORE_DIR = os.environ.get("DATASET_STORE_DIR", "./dataset_store")
+DATASET_STORE_MAX_BYTES = int(os.environ.get("DATASET_STORE_MAX_BYTES", 2 * 1024 ** 3))
+
+HASH_BLOCK_SIZE = 1024 * 1024
+DATASET_ID_LENGTH = 32
+
+
+class DatasetNotFoundError(KeyError):
+    """Raised when a dataset ID is unknown or has been evicted from the store."""
+
+
+class DatasetStore:
+    """Content-addressed cache of uploaded CSV files.
+
+    Each upload is hashed and, the first time its content is seen, parsed once
+    into an uncompressed Arrow IPC file next to a JSON copy of its profile.
+    The hash prefix is the ``dataset_id``. Reloads memory-map the Arrow file,
+    so numeric columns are read without copying. Total size on disk is kept
+    under ``max_bytes`` by evicting the least recently used datasets.
+    """
+
+    def __init__(self, root=DATASET_STORE_DIR, max_bytes=DATASET_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def put(self, fileobj):
+        """Store an uploaded CSV file object; returns ``(dataset_id, profile)``.
+
+        A file whose content is already stored is only hashed, never re-parsed.
+        """
+        with stage("hashing"):
+            dataset_id = _hash_file(fileobj)
+        if self.contains(dataset_id):
+            return dataset_id, self.get_profile(dataset_id)
+
+        # The profiling pass reads the CSV untyped; the typed parse into Arrow follows once dtypes are known
+        with stage("profiling"):
+            profile = profile_csv(fileobj)
+        tmp_suffix = f".{uuid.uuid4().hex}.tmp"
+        arrow_path, profile_path = self._paths(dataset_id)
+        with stage("csv_parsing", rows=profile["num_rows"]):
+            _write_arrow(fileobj, profile, arrow_path + tmp_suffix)
+        with open(profile_path + tmp_suffix, "w") as f:
+            json.dump(profile, f)
+        # Publish the profile first: a dataset counts as stored once its Arrow file exists
+        os.replace(profile_path + tmp_suffix, profile_path)
+        os.replace(arrow_path + tmp_suffix, arrow_path)
+
+        self._evict(keep=dataset_id)
+        return dataset_id, profile
+
+    def contains(self, dataset_id):
+        return _valid_id(dataset_id) and os.path.exists(self._paths(dataset_id)[0])
+
+    def get_profile(self, dataset_id):
+        _, profile_path = self._paths(self._require(dataset_id))
+        with open(profile_path) as f:
+            return json.load(f)
+
+    def load_table(self, dataset_id):
+        """Memory-map a stored dataset as a ``pyarrow.Table`` (zero-copy)."""
+        arrow_path, _ = self._paths(self._require(dataset_id))
+        with pa.memory_map(arrow_path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table
+
+    def load_dataframe(self, dataset_id, missing_value_symbol=None):
+        """Load a stored dataset as a DataFrame.
+
+        ``missing_value_symbol`` marks an extra token as missing, matching what
+        passing it in ``na_values`` to ``pd.read_csv`` would have done.
+        """
+        df = self.load_table(dataset_id).to_pandas(split_blocks=True)
+        if missing_value_symbol and missing_value_symbol.strip() and missing_value_symbol not in DEFAULT_NA_VALUES:
+            df = _mark_missing(df, missing_value_symbol)
+        return df
+
+    def _require(self, dataset_id):
+        if not _valid_id(dataset_id):
+            raise DatasetNotFoundError(dataset_id)
+        try:
+            # Touch the dataset so LRU eviction sees it as recently used
+            os.utime(self._paths(dataset_id)[0])
+        except FileNotFoundError:
+            # Never stored, or evicted (possibly by another process) since
+            raise DatasetNotFoundError(dataset_id) from None
+        return dataset_id
+
+    def _paths(self, dataset_id):
+        base = os.path.join(self.root, dataset_id)
+        return base + ".arrow", base + ".json"
+
+    def _evict(self, keep=None):
+        with self._lock:
+            # A dataset's .arrow sorts before its .json, so it stops counting as stored before its profile goes
+            evict_lru(self.root, self.max_bytes, entry_key=_dataset_id_of, keep={keep})
+
+
+def _hash_file(fileobj):
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(HASH_BLOCK_SIZE), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()[:DATASET_ID_LENGTH]
+
+
+def _valid_id(dataset_id):
+    return valid_id(dataset_id, DATASET_ID_LENGTH)
+
+
+def _dataset_id_of(name):
+    dataset_id, ext = os.path.splitext(name)
+    return dataset_id if ext in (".arrow", ".json") else None
+
+
+def _column_dtypes(profile):
+    """Fix every column's dtype from the profile so all chunks share one schema."""
+    dtypes, fields = {}, []
+    for column in profile["column_details"]:
+        low = column["stats"]["min"]
+        if column["type"] == "categorical":
+            dtype, arrow_type = str, pa.string()
+        elif isinstance(low, bool):
+            dtype, arrow_type = "bool", pa.bool_()
+        elif isinstance(low, int):
+            dtype, arrow_type = "int64", pa.int64()
+        else:
+            dtype, arrow_type = "float64", pa.float64()
+        dtypes[column["name"]] = dtype
+        fields.append(pa.field(column["name"], arrow_type))
+    return dtypes, pa.schema(fields)
+
+
+def _write_arrow(fileobj, profile, path, chunksize=None):
+    dtypes, schema = _column_dtypes(profile)
+    if chunksize is None:
+        chunksize = default_chunksize(len(dtypes))
+    fileobj.seek(0)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for chunk in pd.read_csv(fileobj, na_values=DEFAULT_NA_VALUES, dtype=dtypes, chunksize=chunksize):
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+    fileobj.seek(0)
+
+
+def _mark_missing(df, symbol):
+    try:
+        numeric_symbol = float(symbol)
+    except ValueError:
+        numeric_symbol = None
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+            if numeric_symbol is not None and (df[col] == numeric_symbol).any():
+                df[col] = df[col].where(df[col] != numeric_symbol, np.nan)
+        elif not pd.api.types.is_bool_dtype(df[col]) and (df[col] == symbol).any():
+            df[col] = df[col].where(df[col] != symbol, np.nan)
+            # Stored as text only because of the symbol: numeric once it is masked, as read_csv would parse it
+            try:
+                df[col] = pd.to_numeric(df[col], errors="raise")
+            except (ValueError, TypeError):
+                pass
+    return df
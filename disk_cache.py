@@ -0,0 +1,72 @@
+import os
+import shutil
+import time
+
+HEX_DIGITS = "0123456789abcdef"
+
+# Unfinished temporary files and directories older than this were left behind by a killed writer
+STALE_TMP_SECONDS = 600
+
+
+def valid_id(value, length=32):
+    """Whether ``value`` is a ``length``-character lowercase hex ID, and so safe to use as a file name."""
+    return isinstance(value, str) and len(value) == length and all(c in HEX_DIGITS for c in value)
+
+
+def evict_lru(root, max_bytes, max_entries=None, entry_key=None, keep=(), stale_tmp_seconds=STALE_TMP_SECONDS):
+    """Deletes the least recently used entries under ``root`` until they fit ``max_bytes`` (and ``max_entries``).
+
+    The files and directories that ``entry_key(name)`` maps to the same key
+    (by default, each name is its own key) form one entry; names mapped to
+    ``None`` are left alone. An entry's last use is its newest mtime, which
+    the caches bump with ``os.utime``. Keys in ``keep`` are never deleted.
+    Hidden names and ``*.tmp`` files or directories are never entries;
+    ``*.tmp`` ones untouched for ``stale_tmp_seconds`` are deleted. Other
+    processes may evict the same root concurrently.
+    """
+    now = time.time()
+    entries = {}
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        try:
+            stat = os.stat(path)
+            if name.endswith(".tmp"):
+                if stale_tmp_seconds is not None and now - _last_modified(path, stat) > stale_tmp_seconds:
+                    _remove(path)
+                continue
+            key = None if name.startswith(".") else entry_key(name) if entry_key else name
+            if key is None:
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path)) if os.path.isdir(path) else stat.st_size
+        except FileNotFoundError:
+            continue
+        last_used, total, paths = entries.get(key, (0, 0, []))
+        entries[key] = (max(last_used, stat.st_mtime), total + size, paths + [path])
+
+    count, total = len(entries), sum(size for _, size, _ in entries.values())
+    for key, (_, size, paths) in sorted(entries.items(), key=lambda item: item[1][0]):
+        if total <= max_bytes and (max_entries is None or count <= max_entries):
+            break
+        if key in keep:
+            continue
+        for path in sorted(paths):
+            _remove(path)
+        count, total = count - 1, total - size
+
+
+def _last_modified(path, stat):
+    # A directory's own mtime stops changing once its files exist, though they may still be written
+    if not os.path.isdir(path):
+        return stat.st_mtime
+    return max([stat.st_mtime] + [entry.stat().st_mtime for entry in os.scandir(path)])
+
+
+def _remove(path):
+    # Already gone if another process evicted it first; memory-mapped readers keep working either way
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
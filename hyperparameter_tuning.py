@@ -0,0 +1,303 @@
+import math
+import time
+import numpy as np
+from joblib import Parallel, delayed, parallel_config
+from scipy.stats import loguniform, randint, uniform
+from sklearn.base import clone, is_classifier
+from sklearn.model_selection import KFold, ParameterSampler, StratifiedKFold, train_test_split
+
+# Default search budget: whichever of time or trials runs out first ends the search
+TUNING_TIME_BUDGET = 60.0
+TUNING_MAX_TRIALS = 20
+
+CV_FOLDS = 3
+HALVING_FACTOR = 3
+MIN_RESOURCES = 500  # Training rows given to each candidate in the first halving rung
+VALIDATION_FRACTION = 0.1  # Held out of the training rows for XGBoost early stopping
+
+# Per-algorithm search spaces (lists are sampled uniformly, scipy distributions via rvs)
+SEARCH_SPACES = {
+    "Random Forest": {
+        "n_estimators": [50, 100, 200, 400],
+        "max_depth": [None, 8, 16, 32],
+        "min_samples_leaf": [1, 2, 4],
+        "max_features": ["sqrt", "log2", 0.5, 1.0],
+    },
+    "Gradient Boosting": {
+        "learning_rate": loguniform(0.03, 0.3),
+        "max_depth": [2, 3, 4, 5],
+        "subsample": [0.6, 0.8, 1.0],
+        "min_samples_leaf": [1, 5, 20],
+    },
+    "XGBoost": {
+        "learning_rate": loguniform(0.01, 0.3),
+        "max_depth": randint(3, 11),
+        "subsample": uniform(0.6, 0.4),
+        "colsample_bytree": uniform(0.6, 0.4),
+        "min_child_weight": [1, 3, 5],
+    },
+    "SVM": {
+        "C": loguniform(0.01, 100),
+        "gamma": ["scale", "auto", 0.001, 0.01, 0.1, 1.0],
+    },
+    "KNN": {
+        "n_neighbors": randint(1, 51),
+        "weights": ["uniform", "distance"],
+        "p": [1, 2],
+    },
+}
+
+# Boosting models get a generous round limit and stop on their own validation score
+EARLY_STOPPING_PARAMS = {
+    "Gradient Boosting": {"n_estimators": 300, "n_iter_no_change": 10, "validation_fraction": VALIDATION_FRACTION},
+    "XGBoost": {"n_estimators": 1000, "early_stopping_rounds": 20},
+}
+
+# Share of the time budget kept for the refit of early-stopped boosters: on all rows they run
+# many more rounds than on a rung, so their refit time cannot be extrapolated from the trials
+REFIT_BUDGET_SHARE = 0.3
+
+# Error of a trial cut short by the time budget (after the first); its score is not ranked
+TRIAL_STOPPED = "stopped by the time budget"
+
+# Settings used only while scoring candidates; Platt scaling multiplies SVC fit time by ~5
+TRIAL_PARAMS = {
+    "SVM": {"probability": False},
+}
+
+
+def tune_model(model, algorithm, X, y, fixed_params=None, time_budget=TUNING_TIME_BUDGET,
+               max_trials=TUNING_MAX_TRIALS, n_jobs=None, random_state=42, progress_callback=None):
+    """Successive-halving random search over ``SEARCH_SPACES[algorithm]``.
+
+    ``max_trials`` random candidates are scored by ``CV_FOLDS``-fold CV on a
+    growing subsample of the rows (folds run side by side within the
+    ``n_jobs`` core budget); only the best ``1 / HALVING_FACTOR`` advance to
+    the next rung. A rung or trial is skipped when, with the final refit, it
+    is expected to run past ``time_budget`` seconds (the latest rung's times
+    scaled by row count). Early-stopped boosters run many more rounds on all
+    rows, so at least ``REFIT_BUDGET_SHARE`` of the budget is kept for their
+    refit; their trials and refit stop adding rounds once their share of the
+    budget is spent. Other estimators cannot be stopped mid-fit, so the first
+    trial always runs to the end and can overrun a budget shorter than it.
+    ``fixed_params`` (the user's hyperparameters) are never searched over.
+
+    The winner is fitted once on all of ``X``; returns ``(fitted_model, report)``.
+    """
+    started_at = time.time()
+    report_progress = progress_callback or (lambda stage, fraction: None)
+    fixed_params = fixed_params or {}
+    base = clone(model).set_params(**_supported(model, {**EARLY_STOPPING_PARAMS.get(algorithm, {}), **fixed_params}))
+    trial_params = _supported(model, TRIAL_PARAMS.get(algorithm, {}))
+
+    space = {k: v for k, v in SEARCH_SPACES.get(algorithm, {}).items() if k not in fixed_params and k in model.get_params()}
+    candidates = [
+        {k: v.item() if isinstance(v, np.generic) else v for k, v in params.items()}
+        for params in ParameterSampler(space, n_iter=max_trials, random_state=random_state)
+    ] if space else [{}]
+
+    # Rung sizes grow by HALVING_FACTOR up to the full training set
+    n_rows = len(y)
+    n_rungs = 1 + int(math.log(len(candidates), HALVING_FACTOR)) if len(candidates) > 1 else 1
+    resources = [max(min(n_rows, MIN_RESOURCES), n_rows // HALVING_FACTOR ** (n_rungs - 1 - rung)) for rung in range(n_rungs)]
+    order = np.random.default_rng(random_state).permutation(n_rows)
+
+    trials = []
+    total_trials = sum(math.ceil(len(candidates) / HALVING_FACTOR ** rung) for rung in range(n_rungs))
+    out_of_budget = False
+    alive = list(range(len(candidates)))
+    for rung, resource in enumerate(resources):
+        rows = np.sort(order[:resource])
+        X_rung, y_rung = _take(X, rows), _take(y, rows)
+        cv = _cv_splitter(base, y_rung, random_state)
+        scores = {}
+        if trials:
+            # Skip a rung that cannot finish, refit included, inside the budget
+            trial_time, refit_time = _expected_costs(trials, resource, n_rows, algorithm, time_budget)
+            if time.time() - started_at + trial_time * len(alive) + refit_time > time_budget:
+                out_of_budget = True
+                break
+        for index in alive:
+            if trials:
+                trial_time, refit_time = _expected_costs(trials, resource, n_rows, algorithm, time_budget)
+                if time.time() - started_at + trial_time + refit_time > time_budget:
+                    out_of_budget = True
+                    break
+            report_progress("tuning", 0.35 + 0.45 * len(trials) / total_trials)
+            estimator = clone(base).set_params(**candidates[index], **trial_params)
+            # Boosting trials stop adding rounds where the refit's share of the budget begins
+            deadline = _Deadline(started_at + (1 - REFIT_BUDGET_SHARE) * time_budget) if algorithm in EARLY_STOPPING_PARAMS else None
+            trial = _evaluate(estimator, algorithm, X_rung, y_rung, cv, n_jobs, deadline)
+            trial.update({"candidate": index, "rung": rung, "n_samples": int(resource), "params": candidates[index]})
+            trials.append(trial)
+            if trial["stopped_by_time_budget"]:
+                out_of_budget = True
+                if len(trials) > 1:
+                    # Fewer rounds understate a candidate: a cut-short trial is only ranked when it is the only one
+                    trial["error"] = TRIAL_STOPPED
+                break
+            scores[index] = trial["mean_score"]
+        if out_of_budget or rung == n_rungs - 1:
+            break
+        ranked = sorted(scores, key=lambda index: _rank_key(scores[index]), reverse=True)
+        alive = ranked[:max(1, math.ceil(len(alive) / HALVING_FACTOR))]
+
+    scored = [trial for trial in trials if trial["error"] is None]
+    if not scored:
+        raise ValueError(f"Hyperparameter tuning failed for every candidate: {trials[0]['error']}")
+    best = max(scored, key=lambda trial: (trial["rung"], _rank_key(trial["mean_score"])))
+
+    # The only fit on the full training set
+    report_progress("training", 0.8)
+    refit_started_at = time.time()
+    final = clone(base).set_params(**candidates[best["candidate"]])
+    # Boosters stop adding rounds at the end of the budget, but get at least their reserved share
+    deadline = _Deadline(max(started_at + time_budget, refit_started_at + REFIT_BUDGET_SHARE * time_budget))
+    fit_estimator(final, algorithm, X, y, random_state, deadline=deadline)
+
+    return final, {
+        "strategy": "successive_halving_random_search",
+        "cv_folds": CV_FOLDS,
+        "time_budget": time_budget,
+        "max_trials": max_trials,
+        "stopped_by_time_budget": out_of_budget,
+        "n_trials": len(trials),
+        "best_params": candidates[best["candidate"]],
+        "best_score": best["mean_score"],
+        "trials": trials,
+        "search_time": refit_started_at - started_at,
+        "refit_time": time.time() - refit_started_at,
+        "refit_stopped_by_time_budget": deadline.reached,
+        **_early_stopping_summary(final, algorithm),
+    }
+
+
+def fit_estimator(model, algorithm, X, y, random_state=42, deadline=None):
+    """Fits ``model``, holding out a validation split when XGBoost early stopping is on.
+
+    A ``deadline`` (``_Deadline``) stops boosting models from adding rounds once it has passed.
+    """
+    if algorithm == "XGBoost":
+        if deadline is not None:
+            model.set_params(callbacks=[_xgboost_callback(deadline)])
+        try:
+            if not model.get_params().get("early_stopping_rounds"):
+                return model.fit(X, y)
+            stratify = y if is_classifier(model) and _min_class_count(y) >= 2 else None
+            X_fit, X_val, y_fit, y_val = train_test_split(
+                X, y, test_size=VALIDATION_FRACTION, random_state=random_state, stratify=stratify
+            )
+            return model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+        finally:
+            # The callback is only needed while fitting; keep it out of the stored model
+            model.set_params(callbacks=None)
+    if algorithm == "Gradient Boosting" and deadline is not None:
+        return model.fit(X, y, monitor=deadline)
+    return model.fit(X, y)
+
+
+class _Deadline:
+    """Stop signal for boosting once ``time.time()`` passes ``deadline``; callable as a GradientBoosting ``monitor``."""
+
+    def __init__(self, deadline):
+        self.deadline = deadline
+        self.reached = False
+
+    def __call__(self, *args):
+        self.reached = self.reached or time.time() > self.deadline
+        return self.reached
+
+
+def _xgboost_callback(deadline):
+    from xgboost.callback import TrainingCallback
+
+    class DeadlineCallback(TrainingCallback):
+        def after_iteration(self, model, epoch, evals_log):
+            return deadline()
+
+    return DeadlineCallback()
+
+
+def supported_params(model, params):
+    """Splits ``params`` into those ``model`` accepts and the names it does not."""
+    valid = model.get_params()
+    return _supported(model, params), sorted(k for k in params if k not in valid)
+
+
+def _evaluate(estimator, algorithm, X, y, cv, n_jobs, deadline=None):
+    started_at = time.time()
+    # Split the core budget: up to CV_FOLDS folds side by side, each estimator gets the remaining threads
+    fold_jobs = max(1, min(CV_FOLDS, n_jobs or 1))
+    threads = max(1, (n_jobs or 1) // fold_jobs)
+    estimator = clone(estimator).set_params(**_supported(estimator, {"n_jobs": threads}))
+    try:
+        with parallel_config(backend="loky", inner_max_num_threads=threads):
+            folds = Parallel(n_jobs=fold_jobs)(
+                delayed(_fit_and_score)(clone(estimator), algorithm, X, y, train, test, deadline)
+                for train, test in cv.split(X, y)
+            )
+        scores = [score for score, _, _ in folds]
+        return {
+            "mean_score": float(np.mean(scores)),
+            "fold_scores": scores,
+            "fit_time": float(np.mean([fit_time for _, fit_time, _ in folds])),
+            "time": time.time() - started_at,
+            "stopped_by_time_budget": any(stopped for _, _, stopped in folds),
+            "error": None,
+        }
+    except Exception as e:
+        return {"mean_score": None, "fold_scores": [], "fit_time": None, "time": time.time() - started_at,
+                "stopped_by_time_budget": False, "error": str(e)}
+
+
+def _fit_and_score(estimator, algorithm, X, y, train, test, deadline=None):
+    started_at = time.time()
+    fit_estimator(estimator, algorithm, _take(X, train), _take(y, train), deadline=deadline)
+    fit_time = time.time() - started_at
+    # The deadline is a copy in a loky worker, so whether it stopped the fit is returned explicitly
+    return float(estimator.score(_take(X, test), _take(y, test))), fit_time, bool(deadline and deadline.reached)
+
+
+def _cv_splitter(estimator, y, random_state):
+    if is_classifier(estimator) and _min_class_count(y) >= CV_FOLDS:
+        return StratifiedKFold(n_splits=CV_FOLDS, shuffle=True, random_state=random_state)
+    return KFold(n_splits=CV_FOLDS, shuffle=True, random_state=random_state)
+
+
+def _expected_costs(trials, resource, n_rows, algorithm, time_budget):
+    """Expected seconds of a trial on ``resource`` rows and of the refit on ``n_rows``, from the latest rung."""
+    latest = [trial for trial in trials if trial["rung"] == trials[-1]["rung"]]
+    n_samples = latest[0]["n_samples"]
+    trial_time = np.mean([trial["time"] for trial in latest]) * resource / n_samples
+    fit_times = [trial["fit_time"] for trial in latest if trial["fit_time"] is not None]
+    # CV fits only see (CV_FOLDS - 1) / CV_FOLDS of the rung's rows
+    refit_time = np.mean(fit_times) * n_rows * CV_FOLDS / ((CV_FOLDS - 1) * n_samples) if fit_times else 0.0
+    if algorithm in EARLY_STOPPING_PARAMS:
+        refit_time = max(refit_time, REFIT_BUDGET_SHARE * time_budget)
+    return trial_time, refit_time
+
+
+def _early_stopping_summary(model, algorithm):
+    if algorithm == "XGBoost" and getattr(model, "best_iteration", None) is not None:
+        return {"boosting_rounds": int(model.best_iteration) + 1}
+    if algorithm == "Gradient Boosting" and hasattr(model, "n_estimators_"):
+        return {"boosting_rounds": int(model.n_estimators_)}
+    return {}
+
+
+def _supported(model, params):
+    valid = model.get_params()
+    return {k: v for k, v in params.items() if k in valid}
+
+
+def _rank_key(score):
+    return -np.inf if score is None or np.isnan(score) else score
+
+
+def _min_class_count(y):
+    _, counts = np.unique(np.asarray(y), return_counts=True)
+    return counts.min()
+
+
+def _take(data, rows):
+    return data.iloc[rows] if hasattr(data, "iloc") else data[rows]
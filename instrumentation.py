@@ -0,0 +1,262 @@
+import contextvars
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("automl")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Stages of the current request/job, and the stages currently open (for nested peak memory)
+_collector = contextvars.ContextVar("automl_stage_collector", default=None)
+_open_stages = contextvars.ContextVar("automl_open_stages", default=())
+
+# Also receives the stages recorded outside any collect_stages block (see set_stage_sink)
+_stage_sink = None
+
+
+def log_event(event, **fields):
+    """Writes one structured (JSON) log line."""
+    logger.info(json.dumps({"event": event, "time": time.time(), **fields}, default=str))
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and histograms rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._values = {}
+
+    def inc(self, name, labels=None, value=1.0, help=""):
+        with self._lock:
+            key = self._key(name, "counter", labels, help)
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def set(self, name, value, labels=None, help=""):
+        with self._lock:
+            self._values[self._key(name, "gauge", labels, help)] = value
+
+    def set_max(self, name, value, labels=None, help=""):
+        with self._lock:
+            key = self._key(name, "gauge", labels, help)
+            self._values[key] = max(self._values.get(key, value), value)
+
+    def observe(self, name, value, labels=None, buckets=DURATION_BUCKETS, help=""):
+        with self._lock:
+            key = self._key(name, "histogram", labels, help)
+            self._values.setdefault(key, _Histogram(buckets)).observe(value)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            by_name = {}
+            for (name, labels), value in self._values.items():
+                by_name.setdefault(name, []).append((labels, value))
+            for name in sorted(by_name):
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {self._types[name]}")
+                for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+                    if isinstance(value, _Histogram):
+                        for bound, count in zip(value.buckets, value.counts):
+                            lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {count}")
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {value.count}")
+                        lines.append(f"{name}_sum{_labels(labels)} {_number(value.sum)}")
+                        lines.append(f"{name}_count{_labels(labels)} {value.count}")
+                    else:
+                        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _key(self, name, kind, labels, help):
+        self._types.setdefault(name, kind)
+        self._help.setdefault(name, help or name)
+        return name, tuple(sorted((labels or {}).items()))
+
+
+metrics = MetricsRegistry()
+
+
+def observe_stages(stages):
+    """Adds stage records (e.g. shipped back from a worker process) to the ``/metrics`` series."""
+    for record in stages:
+        metrics.observe("automl_stage_duration_seconds", record["seconds"], {"stage": record["stage"]},
+                        help="Wall time of each pipeline stage.")
+        if record.get("peak_memory_bytes") is not None:
+            metrics.set_max("automl_stage_peak_memory_bytes", record["peak_memory_bytes"], {"stage": record["stage"]},
+                            help="Highest process RSS seen during a pipeline stage.")
+
+
+@contextmanager
+def collect_stages():
+    """Collects every stage recorded inside the block (threads started by Starlette included) into a list."""
+    stages = []
+    token = _collector.set(stages)
+    try:
+        yield stages
+    finally:
+        _collector.reset(token)
+
+
+@contextmanager
+def stage(name, **fields):
+    """Times a pipeline stage and records the peak resident memory reached during it.
+
+    The record is logged as a structured ``stage`` event, added to the
+    ``/metrics`` series of this process and appended to the enclosing
+    ``collect_stages`` list. On Linux the kernel's RSS high-water mark is
+    reset at the start of each stage, so the peak is the stage's own; the
+    mark is process-wide, so stages running concurrently in other threads
+    share it. Elsewhere the process-lifetime peak is reported.
+    """
+    parent = _open_stages.get()
+    current = {"peak": 0}
+    if parent:
+        # Fold what the enclosing stage reached so far into it before the mark is reset
+        parent[-1]["peak"] = max(parent[-1]["peak"], _peak_rss() or 0)
+    _reset_peak_rss()
+    token = _open_stages.set(parent + (current,))
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started_at
+        _open_stages.reset(token)
+        peak = _peak_rss()
+        peak = max(current["peak"], peak) if peak is not None else None
+        if parent and peak is not None:
+            parent[-1]["peak"] = max(parent[-1]["peak"], peak)
+        record_stage(name, seconds, peak, **fields)
+
+
+def record_stage(name, seconds, peak_memory_bytes=None, **fields):
+    record = {"stage": name, "seconds": seconds, "peak_memory_bytes": peak_memory_bytes, **fields}
+    log_event("stage", **record)
+    observe_stages([record])
+    stages = _collector.get()
+    if stages is not None:
+        stages.append(record)
+    elif _stage_sink is not None:
+        _stage_sink(record)
+    return record
+
+
+def set_stage_sink(sink):
+    """Passes every stage recorded outside a ``collect_stages`` block to ``sink(record)`` too.
+
+    Worker processes use it for background work (chart rendering) that
+    finishes after the job result has been returned.
+    """
+    global _stage_sink
+    _stage_sink = sink
+
+
+def summarize_stages(stages):
+    """Total seconds and highest peak memory per stage name, in first-seen order."""
+    summary = {}
+    for record in stages:
+        entry = summary.setdefault(record["stage"], {"seconds": 0.0, "peak_memory_bytes": None, "calls": 0})
+        entry["seconds"] += record["seconds"]
+        entry["calls"] += 1
+        if record.get("peak_memory_bytes") is not None:
+            entry["peak_memory_bytes"] = max(entry["peak_memory_bytes"] or 0, record["peak_memory_bytes"])
+    return summary
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware: request counts/latency per route, plus one structured log line per request.
+
+    Wraps the whole response, so the stages of streamed bodies (``/predict``) are included.
+    """
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started_at = time.perf_counter()
+        with collect_stages() as stages:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                seconds = time.perf_counter() - started_at
+                route = getattr(scope.get("route"), "path", None) or ("/static" if scope["path"].startswith("/static/") else "unmatched")
+                labels = {"method": scope["method"], "route": route}
+                metrics.inc("automl_http_requests_total", {**labels, "status": str(status["code"])},
+                            help="HTTP requests served.")
+                metrics.observe("automl_http_request_duration_seconds", seconds, labels,
+                                help="HTTP request latency, streamed bodies included.")
+                log_event("request", **labels, path=scope["path"], status=status["code"], seconds=seconds,
+                          stages=summarize_stages(stages))
+
+
+def _peak_rss():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return str(value) if isinstance(value, int) else repr(float(value))
@@ -0,0 +1,243 @@
+import multiprocessing
+import os
+import tempfile
+import time
+from multiprocessing.connection import wait
+import joblib
+import numpy as np
+from algorithms import ALGORITHMS, estimator_modules
+from preprocessing import preprocess_data
+
+# Algorithms whose fit/predict use several threads; the others get one core each
+MULTITHREADED_ALGORITHMS = {"Random Forest", "XGBoost", "KNN"}
+
+# Seconds between checks for finished, timed-out or cancelled fits
+POLL_INTERVAL = 1.0
+
+
+def allocate_cores(algorithms, cores):
+    """Splits a core budget between algorithms fitted side by side.
+
+    Single-threaded algorithms get one core; multi-threaded ones share what is
+    left. Returns ``{algorithm: cores}`` for the first ``cores`` algorithms
+    that can run at once.
+    """
+    running = list(algorithms)[:max(1, cores)]
+    multi = [alg for alg in running if alg in MULTITHREADED_ALGORITHMS]
+    spare = max(0, cores - (len(running) - len(multi)))
+    share = max(1, spare // len(multi)) if multi else 1
+    return {alg: share if alg in MULTITHREADED_ALGORITHMS else 1 for alg in running}
+
+
+def compare_models(df, target_column, algorithms, missing_value_strategy, scaling_strategy, cores=None,
+                   time_budget=None, progress_callback=None, prepared_data=None, model_registry=None, model_meta=None):
+    """Fits several algorithms concurrently on one preprocessed train/test split.
+
+    Preprocessing and the split run once (or come from ``prepared_data``); the matrices are written to a
+    temporary directory and memory-mapped by one child process per algorithm.
+    Yields each model's result as soon as it finishes, so results arrive in
+    completion order. A model still fitting after ``time_budget`` seconds is
+    stopped and reported with status ``"timeout"``. With a ``model_registry``
+    each child stores its fitted model and reports its ``model_id``.
+    """
+    algorithms = list(algorithms or ALGORITHMS)
+    unknown = [alg for alg in algorithms if alg not in ALGORITHMS]
+    if unknown:
+        raise ValueError(f"Invalid algorithm(s) {unknown} selected.")
+    cores = cores or os.cpu_count() or 1
+    report = progress_callback or (lambda stage, fraction: None)
+
+    report("preprocessing", 0.05)
+    data = prepared_data or preprocess_data(df, target_column, missing_value_strategy, scaling_strategy)
+    problem_type = data.problem_type
+    class_labels = list(data.target_encoder.classes_) if data.target_encoder is not None else None
+
+    with tempfile.TemporaryDirectory(prefix="compare-") as tmp:
+        paths = {}
+        for name in ("X_train", "X_test", "y_train", "y_test"):
+            paths[name] = os.path.join(tmp, f"{name}.npy")
+            np.save(paths[name], getattr(data, name))
+        registry_root = None
+        if model_registry is not None:
+            registry_root = model_registry.root
+            paths["pipeline"] = os.path.join(tmp, "pipeline.joblib")
+            joblib.dump({
+                "preprocessor": data.preprocessor,
+                "target_encoder": data.target_encoder,
+                "meta": {
+                    **(model_meta or {}),
+                    "problem_type": problem_type,
+                    "target_column": data.target_column,
+                    "feature_names": data.feature_names,
+                },
+            }, paths["pipeline"])
+
+        context = fit_context()
+        pending = list(algorithms)
+        running = {}
+        finished = 0
+        try:
+            while pending or running:
+                # Also the cancellation checkpoint, hit at least once per poll interval
+                report("training", 0.1 + 0.9 * finished / len(algorithms))
+
+                # Start as many fits as the core budget allows, re-splitting cores as slots free up
+                free_cores = cores - sum(r["cores"] for r in running.values())
+                if pending and free_cores > 0:
+                    budget = allocate_cores(pending, free_cores)
+                    for algorithm, algorithm_cores in budget.items():
+                        receiver, sender = context.Pipe(duplex=False)
+                        process = context.Process(
+                            target=_fit_and_score,
+                            args=(algorithm, problem_type, paths, class_labels, algorithm_cores, sender, registry_root),
+                            daemon=True,
+                        )
+                        process.start()
+                        sender.close()
+                        pending.remove(algorithm)
+                        running[receiver] = {
+                            "algorithm": algorithm,
+                            "process": process,
+                            "cores": algorithm_cores,
+                            "started_at": time.time(),
+                        }
+
+                timeout = POLL_INTERVAL
+                if time_budget:
+                    deadline = min(r["started_at"] for r in running.values()) + time_budget
+                    timeout = min(timeout, max(0.0, deadline - time.time()))
+
+                for receiver in wait(list(running), timeout=timeout):
+                    entry = running.pop(receiver)
+                    try:
+                        result = receiver.recv()
+                    except EOFError:
+                        result = _failed(entry, f"Worker exited with code {entry['process'].exitcode}")
+                    entry["process"].join()
+                    finished += 1
+                    yield {**result, "problem_type": problem_type}
+
+                if time_budget:
+                    now = time.time()
+                    for receiver, entry in list(running.items()):
+                        if now - entry["started_at"] >= time_budget:
+                            entry["process"].terminate()
+                            entry["process"].join()
+                            del running[receiver]
+                            finished += 1
+                            result = _failed(entry, f"Exceeded the time budget of {time_budget}s", status="timeout")
+                            yield {**result, "problem_type": problem_type}
+        finally:
+            for entry in running.values():
+                entry["process"].terminate()
+                entry["process"].join()
+
+
+def summarize_comparison(results):
+    """Builds the ``model_comparison`` table shown by the UI from per-model results.
+
+    Classification models are ranked by accuracy (higher is better) and
+    regression models by test RMSE (lower is better).
+    """
+    scored = {r["algorithm"]: r["score"] for r in results if r["status"] == "succeeded"}
+    problem_type = results[0]["problem_type"] if results else None
+    best = None
+    if scored:
+        pick = max if problem_type == "classification" else min
+        best = pick(scored, key=scored.get)
+    return {
+        "problem_type": problem_type,
+        "results": results,
+        "model_comparison": {alg: {"score": score, "is_best": alg == best} for alg, score in scored.items()},
+        "best_algorithm": best,
+        "best_score": scored.get(best),
+    }
+
+
+def fit_context():
+    """The multiprocessing context model fits run in (here and in single-model training jobs)."""
+    # Fork from a clean server that has already imported sklearn/xgboost where possible
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["model_training"] + estimator_modules())
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _fit_and_score(algorithm, problem_type, paths, class_labels, cores, conn, registry_root=None):
+    """Child-process entry point: fit one algorithm on the shared, memory-mapped split."""
+    from instrumentation import collect_stages
+
+    started_at = time.time()
+    with collect_stages() as stages:
+        try:
+            result = _fit_evaluate_and_register(algorithm, problem_type, paths, class_labels, cores, registry_root)
+            result.update({"status": "succeeded", "error": None})
+        except Exception as e:
+            result = {"model_id": None, "status": "failed", "metrics": None, "score": None, "fit_time": None, "error": str(e)}
+    try:
+        # Stage timings travel back with the result; this process's metrics die with it
+        conn.send({
+            "algorithm": algorithm,
+            **result,
+            "cores": cores,
+            "total_time": time.time() - started_at,
+            "stages": stages,
+        })
+    finally:
+        conn.close()
+
+
+def _fit_evaluate_and_register(algorithm, problem_type, paths, class_labels, cores, registry_root):
+    from threadpoolctl import threadpool_limits
+    from model_training import build_model, evaluate_model
+    from model_registry import ModelRegistry
+    from instrumentation import stage
+
+    with threadpool_limits(limits=cores):
+        X_train = np.load(paths["X_train"], mmap_mode="r")
+        X_test = np.load(paths["X_test"], mmap_mode="r")
+        y_train = np.load(paths["y_train"])
+        y_test = np.load(paths["y_test"])
+
+        model = build_model(algorithm, problem_type, n_jobs=cores)
+        started_at = time.time()
+        with stage("fitting", algorithm=algorithm, rows=len(y_train)):
+            model.fit(X_train, y_train)
+        fit_time = time.time() - started_at
+        with stage("prediction", algorithm=algorithm, rows=len(y_test)):
+            y_pred = model.predict(X_test)
+
+    with stage("metrics", algorithm=algorithm):
+        if class_labels is not None:
+            # Report metrics with the original class labels, not their integer codes
+            labels = np.asarray(class_labels, dtype=object)
+            y_test, y_pred = labels[y_test], labels[np.asarray(y_pred, dtype="int64")]
+        metrics = evaluate_model(y_test, y_pred, problem_type)
+    if problem_type == "classification":
+        score = float(metrics["accuracy"])
+    else:
+        score = float(np.sqrt(metrics["mean_squared_error"]))
+
+    model_id = None
+    if registry_root is not None:
+        pipeline = joblib.load(paths["pipeline"])
+        model_id = ModelRegistry(registry_root).register(model, pipeline["preprocessor"], pipeline["target_encoder"], {
+            **pipeline["meta"], "algorithm": algorithm, "metrics": metrics,
+        })
+    return {"model_id": model_id, "metrics": metrics, "score": score, "fit_time": fit_time}
+
+
+def _failed(entry, error, status="failed"):
+    return {
+        "algorithm": entry["algorithm"],
+        "model_id": None,
+        "status": status,
+        "metrics": None,
+        "score": None,
+        "cores": entry["cores"],
+        "fit_time": None,
+        "total_time": time.time() - entry["started_at"],
+        "error": error,
+        "stages": [],
+    }
@@ -0,0 +1,232 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from dataset_profiling import DEFAULT_NA_VALUES, default_chunksize
+from disk_cache import evict_lru, valid_id
+from instrumentation import record_stage, stage
+
+# Where fitted models are kept and how many stay loaded in memory
+MODEL_REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", "./model_registry")
+MODEL_CACHE_SIZE = int(os.environ.get("MODEL_CACHE_SIZE", 8))
+MODEL_REGISTRY_MAX_BYTES = int(os.environ.get("MODEL_REGISTRY_MAX_BYTES", 2 * 1024 ** 3))
+
+MODEL_FILE = "model.joblib"
+META_FILE = "meta.json"
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+
+
+class ModelNotFoundError(KeyError):
+    """Raised for unknown model IDs."""
+
+
+class RegisteredModel:
+    """A fitted model bundled with the preprocessing it was trained behind.
+
+    ``preprocessor`` takes the raw feature columns, so new data goes through
+    exactly the transformations the training split did.
+    """
+
+    def __init__(self, model_id, model, preprocessor, target_encoder, meta):
+        self.model_id = model_id
+        self.model = model
+        self.preprocessor = preprocessor
+        self.target_encoder = target_encoder
+        self.meta = meta
+
+    @property
+    def feature_names(self):
+        return self.meta["feature_names"]
+
+    @property
+    def categorical_features(self):
+        columns = self.preprocessor.named_steps["columns"]
+        return [col for name, _, cols in columns.transformers_ if name == "categorical" for col in cols]
+
+    @property
+    def classes(self):
+        return list(self.target_encoder.classes_) if self.target_encoder is not None else None
+
+    def predict_frame(self, df, probabilities=False):
+        """Predicts one batch of raw rows; returns a DataFrame of predictions (and class probabilities)."""
+        X = self.preprocessor.transform(df[self.feature_names])
+        with stage("prediction", algorithm=self.meta.get("algorithm"), rows=len(df)):
+            y_pred = self.model.predict(X)
+            if self.target_encoder is not None:
+                y_pred = self.target_encoder.inverse_transform(np.asarray(y_pred, dtype="int64"))
+            out = pd.DataFrame({"prediction": y_pred}, index=df.index)
+            if probabilities and self.target_encoder is not None and hasattr(self.model, "predict_proba"):
+                # Columns follow the model's class codes, which index target_encoder.classes_
+                proba = self.model.predict_proba(X)
+                labels = self.target_encoder.classes_[np.asarray(self.model.classes_, dtype="int64")]
+                for i, label in enumerate(labels):
+                    out[f"probability_{label}"] = proba[:, i]
+        return out
+
+    def predict_batches(self, batches, probabilities=False):
+        """Yields ``predict_frame`` output for each DataFrame of ``batches``, so memory stays at one batch."""
+        for batch in batches:
+            missing = [col for col in self.feature_names if col not in batch.columns]
+            if missing:
+                raise ValueError(f"Missing feature column(s) {missing}.")
+            yield self.predict_frame(batch, probabilities)
+
+
+def read_batches(fileobj, feature_names, categorical_features=(), arrow=False, na_values=DEFAULT_NA_VALUES, chunksize=None):
+    """Reads a CSV (or Arrow IPC file/stream) upload as DataFrames of about ``chunksize`` rows.
+
+    Categorical features are read as strings, as they were when the dataset was stored.
+    """
+    if chunksize is None:
+        chunksize = default_chunksize(len(feature_names))
+    fileobj.seek(0)
+    if not arrow:
+        dtype = {col: str for col in categorical_features}
+        reader = pd.read_csv(fileobj, dtype=dtype, na_values=na_values, chunksize=chunksize)
+        while True:
+            # Timed per chunk: the parse happens lazily as the stream is consumed
+            started_at = time.perf_counter()
+            chunk = next(reader, None)
+            if chunk is None:
+                return
+            record_stage("csv_parsing", time.perf_counter() - started_at, rows=len(chunk))
+            yield chunk
+
+    try:
+        reader = pa.ipc.open_file(fileobj)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        fileobj.seek(0)
+        batches = pa.ipc.open_stream(fileobj)
+    for batch in batches:
+        for offset in range(0, batch.num_rows, chunksize):
+            yield batch.slice(offset, chunksize).to_pandas()
+
+
+def is_arrow_upload(filename, content_type=None):
+    return (filename or "").lower().endswith(ARROW_SUFFIXES) or "arrow" in (content_type or "")
+
+
+class ModelRegistry:
+    """Fitted models persisted on disk, with an in-process LRU cache of loaded ones.
+
+    Each model lives in ``<root>/<model_id>/`` as one uncompressed joblib file
+    (estimator, preprocessing pipeline and target encoder) plus a JSON copy of
+    its metadata. Loading memory-maps the file: arrays an estimator keeps as
+    is (KNN's training matrix, SVM support vectors, boosters' buffers) stay
+    paged in from disk and shared between processes, and the node arrays of
+    large forests are copied straight out of the mapping instead of through
+    an intermediate buffer. At most ``cache_size`` models are kept loaded.
+
+    Total size on disk is kept under ``max_bytes`` by deleting the least
+    recently registered or loaded models, never ones in this process's cache.
+    """
+
+    def __init__(self, root=MODEL_REGISTRY_DIR, cache_size=MODEL_CACHE_SIZE, max_bytes=MODEL_REGISTRY_MAX_BYTES):
+        self.root = root
+        self.cache_size = cache_size
+        self.max_bytes = max_bytes
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def register(self, model, preprocessor, target_encoder, meta):
+        """Persist a fitted model; ``meta`` needs ``feature_names`` and ``problem_type``. Returns its ``model_id``."""
+        model_id = uuid.uuid4().hex
+        meta = {**meta, "model_id": model_id, "created_at": time.time()}
+        tmp = os.path.join(self.root, f".{model_id}.tmp")
+        os.makedirs(tmp)
+        # Uncompressed, so numpy arrays inside the estimator can be memory-mapped on load
+        joblib.dump({"model": model, "preprocessor": preprocessor, "target_encoder": target_encoder},
+                    os.path.join(tmp, MODEL_FILE))
+        with open(os.path.join(tmp, META_FILE), "w") as f:
+            json.dump(meta, f, default=str)
+        os.rename(tmp, os.path.join(self.root, model_id))
+        self._evict(keep=model_id)
+        return model_id
+
+    def contains(self, model_id):
+        return _valid_id(model_id) and os.path.exists(self.model_path(model_id))
+
+    def model_path(self, model_id):
+        return os.path.join(self.root, model_id, MODEL_FILE)
+
+    def get_meta(self, model_id):
+        self._require(model_id)
+        with open(os.path.join(self.root, model_id, META_FILE)) as f:
+            return json.load(f)
+
+    def list_models(self):
+        """Metadata of every stored model, newest first."""
+        models = []
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            try:
+                models.append(self.get_meta(name))
+            except (ModelNotFoundError, FileNotFoundError):
+                continue
+        return sorted(models, key=lambda meta: meta["created_at"], reverse=True)
+
+    def latest(self):
+        """ID of the most recently registered model, or ``None``."""
+        models = self.list_models()
+        return models[0]["model_id"] if models else None
+
+    def load(self, model_id):
+        """Returns the ``RegisteredModel`` for ``model_id``, loading it (memory-mapped) on a cache miss."""
+        with self._lock:
+            if model_id in self._cache:
+                self._cache.move_to_end(model_id)
+                self._touch(model_id)
+                return self._cache[model_id]
+
+        meta = self.get_meta(model_id)
+        self._touch(model_id)
+        bundle = joblib.load(self.model_path(model_id), mmap_mode="r")
+        loaded = RegisteredModel(model_id, bundle["model"], bundle["preprocessor"], bundle["target_encoder"], meta)
+
+        with self._lock:
+            self._cache[model_id] = loaded
+            self._cache.move_to_end(model_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return loaded
+
+    def delete(self, model_id):
+        self._require(model_id)
+        with self._lock:
+            self._cache.pop(model_id, None)
+        shutil.rmtree(os.path.join(self.root, model_id), ignore_errors=True)
+
+    def _require(self, model_id):
+        if not self.contains(model_id):
+            raise ModelNotFoundError(model_id)
+        return model_id
+
+    def _touch(self, model_id):
+        # Models are registered by worker processes: their LRU order is the directory mtime
+        try:
+            os.utime(os.path.join(self.root, model_id))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep=None):
+        with self._lock:
+            # A model still memory-mapped elsewhere keeps working; only its files go
+            evict_lru(self.root, self.max_bytes, entry_key=_model_id_of, keep=set(self._cache) | {keep})
+
+
+def _valid_id(model_id):
+    return valid_id(model_id)
+
+
+def _model_id_of(name):
+    return name if _valid_id(name) else None
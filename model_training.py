@@ -1,111 +1,104 @@
-import pandas as pd
 import numpy as np
 import json
-import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.model_selection import train_test_split, GridSearchCV
-from sklearn.preprocessing import StandardScaler, MinMaxScaler, LabelEncoder
-from sklearn.impute import SimpleImputer, KNNImputer
-from sklearn.linear_model import LogisticRegression, LinearRegression
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, GradientBoostingClassifier, GradientBoostingRegressor
-from xgboost import XGBClassifier, XGBRegressor
-from sklearn.svm import SVC, SVR
-from sklearn.neighbors import KNeighborsClassifier, KNeighborsRegressor
+from preprocessing import preprocess_data
+from instrumentation import stage
+from algorithms import ALGORITHMS, build_model
+from hyperparameter_tuning import tune_model, supported_params, TUNING_TIME_BUDGET, TUNING_MAX_TRIALS
 from sklearn.metrics import (
     accuracy_score, classification_report, confusion_matrix,
     mean_absolute_error, mean_squared_error, r2_score
 )
 
 
-def train_model(df, target_column, algorithm, hyperparameters, missing_value_strategy, scaling_strategy, auto_tune, generate_visualization):
-    """Processes data, trains model, and evaluates results."""
-
-    # Detect problem type (classification vs regression)
-    problem_type = "classification" if df[target_column].dtype == "object" else "regression"
-
-    # Handle missing values dynamically
-    numerical_cols = df.select_dtypes(include=["int64", "float64"]).columns.tolist()
-    categorical_cols = df.select_dtypes(include=["object"]).columns.tolist()
-
-    imputer_methods = {
-        "mean": SimpleImputer(strategy="mean"),
-        "median": SimpleImputer(strategy="median"),
-        "most_frequent": SimpleImputer(strategy="most_frequent"),
-        "knn": KNNImputer(n_neighbors=5)
+def evaluate_model(y_test, y_pred, problem_type):
+    """Computes the metrics reported for a fitted model's test-set predictions."""
+    if problem_type == "classification":
+        return {
+            "accuracy": accuracy_score(y_test, y_pred),
+            "classification_report": classification_report(y_test, y_pred, output_dict=True),
+            "confusion_matrix": confusion_matrix(y_test, y_pred).tolist()
+        }
+    return {
+        "mean_absolute_error": mean_absolute_error(y_test, y_pred),
+        "mean_squared_error": mean_squared_error(y_test, y_pred),
+        "r2_score": r2_score(y_test, y_pred)
     }
 
-    if missing_value_strategy in imputer_methods:
-        df[numerical_cols] = imputer_methods[missing_value_strategy].fit_transform(df[numerical_cols])
 
-    for col in categorical_cols:
-        df[col] = df[col].fillna(df[col].mode()[0] if not df[col].mode().empty else "Unknown")
+def train_model(df, target_column, algorithm, hyperparameters, missing_value_strategy, scaling_strategy, auto_tune, generate_visualization, progress_callback=None,
+                tuning_time_budget=TUNING_TIME_BUDGET, max_trials=TUNING_MAX_TRIALS, n_jobs=None, prepared_data=None,
+                model_registry=None, model_meta=None):
+    """Processes data, trains model, and evaluates results.
 
-    # Encode categorical variables
-    for col in categorical_cols:
-        if col != target_column:
-            le = LabelEncoder()
-            df[col] = le.fit_transform(df[col])
+    ``progress_callback(stage, fraction)`` is called as each stage starts; it may
+    raise to abort the run (used by the training job queue to cancel jobs).
+    With ``auto_tune`` the model is tuned by ``hyperparameter_tuning.tune_model``
+    within ``tuning_time_budget`` seconds / ``max_trials`` candidates, keeping
+    the user's hyperparameters fixed. ``n_jobs`` is the core budget of the fit
+    (tuning splits it between CV folds and each fold's threads).
+    A cached ``prepared_data`` split (see ``preprocessing``) skips preprocessing.
+    With a ``model_registry`` the fitted model and its preprocessing pipeline are
+    stored (``model_meta`` is added to its metadata) and ``model_id`` is returned.
+    """
+    report = progress_callback or (lambda stage, fraction: None)
+    report("preprocessing", 0.05)
 
-    # Normalize numerical features
-    scaler = StandardScaler() if scaling_strategy == "standard" else MinMaxScaler()
-    df[numerical_cols] = scaler.fit_transform(df[numerical_cols])
-
-    # Train-test split
-    X = df.drop(columns=[target_column])
-    y = df[target_column]
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    data = prepared_data or preprocess_data(df, target_column, missing_value_strategy, scaling_strategy)
+    X_train, X_test, y_train, y_test, problem_type = data.X_train, data.X_test, data.y_train, data.y_test, data.problem_type
 
     # Model selection
-    models = {
-        "Random Forest": RandomForestClassifier() if problem_type == "classification" else RandomForestRegressor(),
-        "Gradient Boosting": GradientBoostingClassifier() if problem_type == "classification" else GradientBoostingRegressor(),
-        "XGBoost": XGBClassifier() if problem_type == "classification" else XGBRegressor(),
-        "SVM": SVC(probability=True) if problem_type == "classification" else SVR(),
-        "KNN": KNeighborsClassifier() if problem_type == "classification" else KNeighborsRegressor()
-    }
+    model = build_model(algorithm, problem_type, n_jobs=n_jobs)
 
-    if algorithm not in models:
-        raise ValueError(f"Invalid algorithm '{algorithm}' selected.")
-
-    model = models[algorithm]
-
-    # Load hyperparameters
+    # Load hyperparameters; names the estimator doesn't accept are reported back, not applied
     hyperparameters = json.loads(hyperparameters)
+    hyperparameters, ignored_hyperparameters = supported_params(model, hyperparameters)
 
+    tuning_report = None
+    report("tuning" if auto_tune else "training", 0.35)
     if auto_tune:
-        param_grid = {"n_estimators": [50, 100, 200]} if "n_estimators" in model.get_params() else {"C": [0.1, 1, 10]}
-        grid_search = GridSearchCV(model, param_grid, cv=5)
-        grid_search.fit(X_train, y_train)
-        model = grid_search.best_estimator_
-
-    model.fit(X_train, y_train)
-    y_pred = model.predict(X_test)
+        # tune_model returns the winner already fitted on the full training set
+        with stage("tuning", algorithm=algorithm, rows=len(y_train)):
+            model, tuning_report = tune_model(
+                model, algorithm, X_train, y_train, fixed_params=hyperparameters,
+                time_budget=tuning_time_budget, max_trials=max_trials, n_jobs=n_jobs, progress_callback=report
+            )
+    else:
+        model.set_params(**hyperparameters)
+        with stage("fitting", algorithm=algorithm, rows=len(y_train)):
+            model.fit(X_train, y_train)
+    report("evaluating", 0.85)
+    with stage("prediction", algorithm=algorithm, rows=len(y_test)):
+        y_pred = data.decode_target(model.predict(X_test))
 
     # Evaluate model
-    if problem_type == "classification":
-        metrics = {
-            "accuracy": accuracy_score(y_test, y_pred),
-            "classification_report": classification_report(y_test, y_pred, output_dict=True),
-            "confusion_matrix": confusion_matrix(y_test, y_pred).tolist()
-        }
-    else:
-        metrics = {
-            "mean_absolute_error": mean_absolute_error(y_test, y_pred),
-            "mean_squared_error": mean_squared_error(y_test, y_pred),
-            "r2_score": r2_score(y_test, y_pred)
-        }
+    with stage("metrics", algorithm=algorithm):
+        metrics = evaluate_model(data.decode_target(y_test), y_pred, problem_type)
 
-    # Generate Visualizations
+    # Generate Visualizations: drawn on a background thread, so the metrics are returned without waiting
+    visualization = None
     if generate_visualization:
-        plt.figure(figsize=(8, 5))
-        sns.histplot(y_pred, kde=True)
-        plt.title(f"{algorithm} Prediction Distribution")
-        plt.savefig("static/prediction_distribution.png")
+        from visualization import default_renderer
+        visualization = default_renderer().submit_prediction_distribution(y_pred, algorithm)
+
+    model_id = None
+    if model_registry is not None:
+        report("saving", 0.97)
+        model_id = model_registry.register(model, data.preprocessor, data.target_encoder, {
+            **(model_meta or {}),
+            "algorithm": algorithm,
+            "problem_type": problem_type,
+            "target_column": data.target_column,
+            "feature_names": data.feature_names,
+            "metrics": metrics,
+        })
 
     return {
         "algorithm": algorithm,
+        "model_id": model_id,
         "metrics": metrics,
-        "best_hyperparameters": model.get_params() if auto_tune else hyperparameters,
-        "visualization": "/static/prediction_distribution.png" if generate_visualization else None
+        # Only the chosen values: get_params() holds non-JSON values such as XGBoost's missing=nan
+        "best_hyperparameters": {**hyperparameters, **tuning_report["best_params"]} if auto_tune else hyperparameters,
+        "ignored_hyperparameters": ignored_hyperparameters,
+        "tuning": tuning_report,
+        "visualization": visualization
     }
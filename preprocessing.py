@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.exceptions import NotFittedError
+from sklearn.impute import KNNImputer, SimpleImputer
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer, LabelEncoder, MinMaxScaler, OrdinalEncoder, StandardScaler
+from sklearn.utils.validation import check_is_fitted
+from disk_cache import evict_lru
+from instrumentation import stage
+
+# Above this many training rows KNN imputation searches a random sample of neighbours
+KNN_EXACT_MAX_ROWS = 10_000
+KNN_TRANSFORM_CHUNK_ROWS = 5_000
+
+PREPROCESSING_CACHE_MAX_ENTRIES = int(os.environ.get("PREPROCESSING_CACHE_MAX_ENTRIES", 32))
+PREPROCESSING_CACHE_MAX_BYTES = int(os.environ.get("PREPROCESSING_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# The UI calls most-frequent imputation "mode"
+MISSING_VALUE_STRATEGIES = {
+    "mean": "mean",
+    "median": "median",
+    "most_frequent": "most_frequent",
+    "mode": "most_frequent",
+    "knn": "knn",
+}
+
+
+class SampledKNNImputer(KNNImputer):
+    """``KNNImputer`` that stays usable on large datasets.
+
+    Neighbours are searched among at most ``max_reference_rows`` randomly
+    sampled training rows instead of all of them, and rows are imputed in
+    chunks, so cost grows linearly with the row count instead of quadratically.
+    """
+
+    def __init__(self, n_neighbors=5, max_reference_rows=KNN_EXACT_MAX_ROWS, chunk_rows=KNN_TRANSFORM_CHUNK_ROWS,
+                 random_state=42):
+        super().__init__(n_neighbors=n_neighbors, keep_empty_features=True)
+        self.max_reference_rows = max_reference_rows
+        self.chunk_rows = chunk_rows
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        X = np.asarray(X, dtype="float64")
+        if len(X) > self.max_reference_rows:
+            rows = np.random.default_rng(self.random_state).choice(len(X), self.max_reference_rows, replace=False)
+            X = X[np.sort(rows)]
+        return super().fit(X, y)
+
+    def transform(self, X):
+        X = np.asarray(X, dtype="float64")
+        return np.vstack([super(SampledKNNImputer, self).transform(X[start:start + self.chunk_rows])
+                          for start in range(0, max(len(X), 1), self.chunk_rows)])
+
+
+class TimedStep(BaseEstimator, TransformerMixin):
+    """Wraps a pipeline step so each fit/transform is recorded as an ``instrumentation`` stage."""
+
+    def __init__(self, step, stage_name):
+        self.step = step
+        self.stage_name = stage_name
+
+    def fit(self, X, y=None):
+        with stage(self.stage_name, rows=len(X)):
+            self.step.fit(X, y)
+        return self
+
+    def fit_transform(self, X, y=None):
+        with stage(self.stage_name, rows=len(X)):
+            return self.step.fit_transform(X, y)
+
+    def transform(self, X):
+        with stage(self.stage_name, rows=len(X)):
+            return self.step.transform(X)
+
+    def get_feature_names_out(self, input_features=None):
+        return self.step.get_feature_names_out(input_features)
+
+    def __sklearn_is_fitted__(self):
+        # Fitted exactly when the wrapped step is
+        try:
+            check_is_fitted(self.step)
+        except NotFittedError:
+            return False
+        return True
+
+
+class PreparedData:
+    """A preprocessed train/test split plus what is needed to reuse it.
+
+    ``X_*`` are C-contiguous float32 matrices; for classification ``y_*`` hold
+    integer class codes, decoded back to labels with ``decode_target``.
+    """
+
+    def __init__(self, X_train, X_test, y_train, y_test, problem_type, preprocessor, target_encoder, feature_names, target_column):
+        self.X_train = X_train
+        self.X_test = X_test
+        self.y_train = y_train
+        self.y_test = y_test
+        self.problem_type = problem_type
+        self.preprocessor = preprocessor
+        self.target_encoder = target_encoder
+        self.feature_names = feature_names
+        self.target_column = target_column
+
+    def decode_target(self, y):
+        return self.target_encoder.inverse_transform(np.asarray(y, dtype="int64")) if self.target_encoder is not None else y
+
+
+def build_preprocessor(numerical_cols, categorical_cols, missing_value_strategy, scaling_strategy, n_rows):
+    """One fitted-on-train pipeline: impute, ordinal-encode, scale, then cast to float32.
+
+    Numeric columns are imputed with ``missing_value_strategy`` and scaled;
+    categorical columns are filled with their most frequent value and encoded
+    (unseen categories become -1). Unknown strategies leave numeric gaps as is.
+    The pipeline takes raw DataFrame columns, so it also serves new data at
+    prediction time. Imputation, encoding and scaling are timed as stages.
+    """
+    numeric_steps = [("coerce", FunctionTransformer(as_numeric, feature_names_out="one-to-one"))]
+    strategy = MISSING_VALUE_STRATEGIES.get(missing_value_strategy)
+    if strategy == "knn":
+        imputer = KNNImputer(n_neighbors=5, keep_empty_features=True) if n_rows <= KNN_EXACT_MAX_ROWS else SampledKNNImputer(n_neighbors=5)
+        numeric_steps.append(("imputer", TimedStep(imputer, "imputation")))
+    elif strategy is not None:
+        numeric_steps.append(("imputer", TimedStep(SimpleImputer(strategy=strategy, keep_empty_features=True), "imputation")))
+    numeric_steps.append(("scaler", TimedStep(StandardScaler() if scaling_strategy == "standard" else MinMaxScaler(), "scaling")))
+
+    categorical_steps = [
+        ("strings", FunctionTransformer(as_category_strings, feature_names_out="one-to-one")),
+        ("imputer", TimedStep(SimpleImputer(strategy="most_frequent", keep_empty_features=True), "imputation")),
+        ("encoder", TimedStep(OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1, dtype=np.float32), "encoding")),
+    ]
+
+    columns = ColumnTransformer([
+        ("numeric", Pipeline(numeric_steps), numerical_cols),
+        ("categorical", Pipeline(categorical_steps), categorical_cols),
+    ], sparse_threshold=0)
+
+    return Pipeline([("columns", columns), ("float32", FunctionTransformer(as_float32, feature_names_out="one-to-one"))])
+
+
+def as_numeric(X):
+    """Numeric view of raw feature columns; unparseable values become NaN."""
+    return pd.DataFrame(X).apply(pd.to_numeric, errors="coerce")
+
+
+def as_category_strings(X):
+    """Categories as strings with NaN for gaps, whatever mix of values/None the loader produced."""
+    X = pd.DataFrame(X)
+    return X.astype(str).astype(object).where(X.notna(), np.nan)
+
+
+def as_float32(X):
+    """Compact, C-contiguous float32 copy of a feature matrix."""
+    return np.ascontiguousarray(X, dtype=np.float32)
+
+
+def preprocess_data(df, target_column, missing_value_strategy, scaling_strategy):
+    """Splits ``df`` into train/test sets and preprocesses them with a pipeline fitted on the train rows only.
+
+    Rows with a missing target are dropped; a non-numeric target means classification.
+    """
+    df = df[df[target_column].notna()]
+    if df.empty:
+        raise ValueError(f"Target column '{target_column}' has no values.")
+    problem_type = "regression" if pd.api.types.is_numeric_dtype(df[target_column]) else "classification"
+
+    X = df.drop(columns=[target_column])
+    numerical_cols = X.select_dtypes(include=["number", "bool"]).columns.tolist()
+    categorical_cols = [col for col in X.columns if col not in numerical_cols]
+
+    with stage("split", rows=len(df)):
+        target_encoder = None
+        y = df[target_column].to_numpy()
+        if problem_type == "classification":
+            target_encoder = LabelEncoder()
+            y = target_encoder.fit_transform(y.astype(str))
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    preprocessor = build_preprocessor(numerical_cols, categorical_cols, missing_value_strategy, scaling_strategy, len(X_train))
+    X_train = preprocessor.fit_transform(X_train)
+    X_test = preprocessor.transform(X_test)
+
+    return PreparedData(
+        X_train, X_test, np.ascontiguousarray(y_train), np.ascontiguousarray(y_test), problem_type,
+        preprocessor, target_encoder, numerical_cols + categorical_cols, target_column
+    )
+
+
+class PreprocessingCache:
+    """On-disk memo of ``PreparedData`` keyed by dataset and preprocessing choices.
+
+    Matrices are saved as ``.npy`` and memory-mapped on load, so a repeated
+    training with the same choices costs only the model fit. At most
+    ``max_entries`` splits totalling ``max_bytes`` are kept; the least
+    recently used are removed.
+    """
+
+    def __init__(self, root, max_entries=PREPROCESSING_CACHE_MAX_ENTRIES, max_bytes=PREPROCESSING_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def key(dataset_id, target_column, missing_value_strategy, scaling_strategy, missing_value_symbol=None):
+        payload = json.dumps([dataset_id, target_column, missing_value_strategy, scaling_strategy, missing_value_symbol])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached ``PreparedData`` for ``key``, or computes and stores it with ``compute()``."""
+        prepared = self.get(key)
+        if prepared is None:
+            prepared = compute()
+            self.put(key, prepared)
+        return prepared
+
+    def get(self, key):
+        path = os.path.join(self.root, key)
+        try:
+            # Mark as recently used; a split evicted meanwhile (by any process) is simply a miss
+            os.utime(path)
+            meta = joblib.load(os.path.join(path, "pipeline.joblib"))
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                      for name in ("X_train", "X_test", "y_train", "y_test")}
+        except FileNotFoundError:
+            return None
+        return PreparedData(**arrays, **meta)
+
+    def put(self, key, prepared):
+        tmp = os.path.join(self.root, f".{key}.{uuid.uuid4().hex}.tmp")
+        os.makedirs(tmp)
+        for name in ("X_train", "X_test", "y_train", "y_test"):
+            np.save(os.path.join(tmp, f"{name}.npy"), getattr(prepared, name))
+        joblib.dump({
+            "problem_type": prepared.problem_type,
+            "preprocessor": prepared.preprocessor,
+            "target_encoder": prepared.target_encoder,
+            "feature_names": prepared.feature_names,
+            "target_column": prepared.target_column,
+        }, os.path.join(tmp, "pipeline.joblib"))
+        try:
+            os.rename(tmp, os.path.join(self.root, key))
+        except OSError:
+            # Another worker stored the same split first
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._evict(keep=key)
+
+    def _evict(self, keep=None):
+        with self._lock:
+            evict_lru(self.root, self.max_bytes, self.max_entries, keep={keep})
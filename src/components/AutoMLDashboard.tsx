@@ -106,6 +106,7 @@ export default function AutoMLDashboard() {
     try {
       const response = await processAutoML({
         file,
+        datasetId: datasetOverview?.dataset_id,
         targetColumn,
         missingValueSymbol,
         missingValueStrategy: missingStrategy,
@@ -429,7 +430,7 @@ export default function AutoMLDashboard() {
                 </Card>
                 
                 <div className="flex flex-wrap gap-2">
-                  <Button onClick={downloadModel} variant="outline" className="flex items-center gap-2">
+                  <Button onClick={() => downloadModel()} variant="outline" className="flex items-center gap-2">
                     <Download className="h-4 w-4" />
                     Download Model
                   </Button>
@@ -383,6 +383,7 @@ const CustomAutoML = () => {
     
     const uploadParams: UploadParams = {
       file: datasetFile,
+      datasetId: datasetOverview?.dataset_id,
       targetColumn: params.targetColumn,
       missingValueStrategy: params.missingValueStrategy,
       scalingStrategy: params.scalingStrategy,
@@ -5,6 +5,7 @@ import { UploadParams } from "./mlApi";
 export const withDefaultParams = (params: Partial<UploadParams>): UploadParams => {
   return {
     file: params.file as File,
+    datasetId: params.datasetId,
     targetColumn: params.targetColumn || "",
     missingValueStrategy: params.missingValueStrategy || "median",
     scalingStrategy: params.scalingStrategy || "standard",
@@ -5,6 +5,7 @@ const API_BASE_URL = "https://no-code-ml-wizard-production.up.railway.app";
 
 export interface UploadParams {
   file: File;
+  datasetId?: string; // ID from /upload-dataset/; when set the file is not re-uploaded
   targetColumn: string;
   missingValueStrategy: string;
   scalingStrategy: string;
@@ -13,6 +14,7 @@ export interface UploadParams {
 }
 
 export interface DatasetOverview {
+  dataset_id: string; // Content hash of the upload, reusable in place of the file
   num_rows: number;
   num_columns: number;
   column_details: ColumnDetail[];
@@ -136,6 +138,7 @@ export const uploadCSV = async (params: Partial<UploadParams>) => {
   // Ensure problemType is set with a default value if missing
   const completeParams: UploadParams = {
     file: params.file as File,
+    datasetId: params.datasetId,
     targetColumn: params.targetColumn || "",
     missingValueStrategy: params.missingValueStrategy || "median",
     scalingStrategy: params.scalingStrategy || "standard",
@@ -151,7 +154,12 @@ export const processAutoML = async (params: Partial<UploadParams>): Promise<Mode
   try {
     console.log("Processing AutoML with params:", params); // Add debugging
     const formData = new FormData();
-    formData.append("file", params.file as File);
+    // Reuse the dataset stored by /upload-dataset/ instead of uploading it again
+    if (params.datasetId) {
+      formData.append("dataset_id", params.datasetId);
+    } else {
+      formData.append("file", params.file as File);
+    }
     formData.append("target_column", params.targetColumn || "");
     formData.append("missing_value_strategy", params.missingValueStrategy || "median");
     formData.append("scaling_strategy", params.scalingStrategy || "standard");
@@ -177,6 +185,11 @@ export const processAutoML = async (params: Partial<UploadParams>): Promise<Mode
     return response.data;
   } catch (error) {
     console.error("Error processing AutoML:", error);
+
+    // The server may have evicted the stored dataset; fall back to uploading the file
+    if (axios.isAxiosError(error) && error.response?.status === 404 && params.datasetId && params.file) {
+      return processAutoML({ ...params, datasetId: undefined });
+    }
     
     if (axios.isAxiosError(error) && error.code === 'ERR_NETWORK') {
       throw new Error("Network error: Unable to connect to the ML server. Please check your internet connection and try again.");
@@ -212,9 +225,11 @@ export const processAutoML = async (params: Partial<UploadParams>): Promise<Mode
   }
 };
 
-export const downloadModel = (): void => {
+export const downloadModel = (modelId?: string): void => {
   try {
-    window.open(`${API_BASE_URL}/download-model/`);
+    // Without an ID the backend serves the most recently trained model
+    const query = modelId ? `?model_id=${encodeURIComponent(modelId)}` : "";
+    window.open(`${API_BASE_URL}/download-model/${query}`);
   } catch (error) {
     console.error("Error downloading model:", error);
     throw new Error("Failed to download the model. Please try again later.");
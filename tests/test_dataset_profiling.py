@@ -0,0 +1,117 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from dataset_profiling import DEFAULT_NA_VALUES, DatasetProfiler, FrequencySketch, profile_csv
+
+LIR_PATH = "LIR.csv"
+
+MIXED_CSV = b"""ints,floats,ties,empty,flag,late_text,label
+1,0.5,b,,True,1,x
+2,?,a,,False,2,y
+,1.25,b,,True,3,
+4,-3.0,a,NA,False,4,x
+5,1e3,c,,False,5,z
+6,2.75,c,,True,text,x
+"""
+
+
+def legacy_profile(source):
+    """The per-column profile ``/upload-dataset/`` computed on the whole DataFrame before chunking."""
+    df = pd.read_csv(source, na_values=DEFAULT_NA_VALUES)
+    column_details = []
+    for col in df.columns:
+        col_type = "categorical" if df[col].dtype == "object" else "numeric"
+        missing_count = int(df[col].isnull().sum())
+        sample_missing_row = None
+        if missing_count > 0:
+            missing_index = df[df[col].isnull()].index[0]
+            sample_row = df.iloc[missing_index].replace({np.nan: "NaN", "?": "?", "": "Empty", None: "Null"}).to_dict()
+            sample_missing_row = str(sample_row)
+        stats = {
+            "min": df[col].min() if col_type == "numeric" else None,
+            "max": df[col].max() if col_type == "numeric" else None,
+            "mean": df[col].mean() if col_type == "numeric" else None,
+            "std_dev": df[col].std() if col_type == "numeric" else None,
+            "median": df[col].median() if col_type == "numeric" else None,
+            "unique_values": df[col].nunique() if col_type == "categorical" else None,
+            "most_common": df[col].mode()[0] if col_type == "categorical" and not df[col].mode().empty else "N/A",
+        }
+        column_details.append({
+            "name": col,
+            "type": col_type,
+            "missing_values": missing_count,
+            "missing_percent": round((missing_count / len(df)) * 100, 2),
+            "stats": {key: _plain(value) for key, value in stats.items()},
+            "sample_missing_row": sample_missing_row,
+        })
+    return {"num_rows": len(df), "num_columns": len(df.columns), "column_details": column_details}
+
+
+def _plain(value):
+    # What the JSON response carries: Python scalars, NaN as null
+    if isinstance(value, np.generic):
+        value = value.item()
+    return None if isinstance(value, float) and np.isnan(value) else value
+
+
+def assert_same_profile(actual, expected):
+    assert actual["num_rows"] == expected["num_rows"]
+    assert actual["num_columns"] == expected["num_columns"]
+    for got, want in zip(actual["column_details"], expected["column_details"], strict=True):
+        assert {k: v for k, v in got.items() if k != "stats"} == {k: v for k, v in want.items() if k != "stats"}
+        for key, value in want["stats"].items():
+            if isinstance(value, float):
+                assert got["stats"][key] == pytest.approx(value, rel=1e-9), (got["name"], key)
+            else:
+                assert got["stats"][key] == value, (got["name"], key)
+                assert type(got["stats"][key]) is type(value), (got["name"], key)
+
+
+@pytest.mark.parametrize("chunksize", [None, 997])
+def test_lir_matches_legacy_profile(chunksize):
+    assert_same_profile(profile_csv(LIR_PATH, chunksize=chunksize), legacy_profile(LIR_PATH))
+
+
+@pytest.mark.parametrize("chunksize", [None, 1, 2, 4])
+def test_mixed_columns_match_legacy_profile(chunksize):
+    # Small chunks exercise the Chan merge, and late_text turning categorical forces a re-read
+    profile = profile_csv(io.BytesIO(MIXED_CSV), chunksize=chunksize)
+    assert_same_profile(profile, legacy_profile(io.BytesIO(MIXED_CSV)))
+
+
+def test_boolean_column_with_gaps_matches_legacy_profile():
+    # True/False plus gaps is an object column of bools; only exact while the gaps share a chunk with the values
+    csv = b"flag,x\nTrue,1\n,2\nFalse,3\nTrue,4\n"
+    assert_same_profile(profile_csv(io.BytesIO(csv)), legacy_profile(io.BytesIO(csv)))
+
+
+def test_first_missing_row_does_not_keep_chunk_alive():
+    chunk = pd.DataFrame({"a": np.arange(1000, dtype="float64"), "b": np.ones(1000)})
+    chunk.loc[500, "a"] = np.nan
+    profiler = DatasetProfiler(chunk.columns)
+    profiler.update(chunk)
+
+    stored = profiler.first_missing_row[0]
+    assert len(stored) == 1
+    for col in chunk.columns:
+        assert not np.shares_memory(stored[col].to_numpy(), chunk[col].to_numpy())
+
+
+def test_empty_dataset_is_rejected():
+    with pytest.raises(ValueError):
+        profile_csv(io.BytesIO(b"a,b\n"))
+
+
+def test_frequency_sketch_truncation_keeps_top_values():
+    rng = np.random.default_rng(0)
+    values = pd.Series(np.concatenate([np.repeat(["common", "second"], [500, 300]), rng.permutation(20_000).astype(str)]))
+    sketch = FrequencySketch(capacity=100, distinct_k=1024)
+    for chunk in np.array_split(values.sample(frac=1, random_state=0), 50):
+        sketch.update(chunk.value_counts())
+
+    assert sketch.truncated
+    assert len(sketch.counts) == 100
+    assert sketch.most_common() == "common"
+    assert sketch.counts["common"] == 500 and sketch.counts["second"] == 300
+    assert sketch.unique_values() == pytest.approx(values.nunique(), rel=0.1)
@@ -0,0 +1,64 @@
+import os
+import time
+from disk_cache import evict_lru, valid_id
+from model_registry import ModelRegistry
+
+
+def _write(path, size, mtime):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_evicts_least_recently_used_entries_whole(tmp_path):
+    now = time.time()
+    for i, name in enumerate("abc"):
+        _write(tmp_path / f"{name}.arrow", 100, now - 30 + 10 * i)
+        _write(tmp_path / f"{name}.json", 10, now - 30 + 10 * i)
+    _write(tmp_path / "notes.txt", 1000, now - 100)
+
+    def dataset_id_of(name):
+        dataset_id, ext = os.path.splitext(name)
+        return dataset_id if ext in (".arrow", ".json") else None
+
+    evict_lru(str(tmp_path), max_bytes=250, entry_key=dataset_id_of, keep={"a"})
+
+    # "a" is kept although oldest, so "b" goes with both its files; unmapped names are not counted
+    assert sorted(os.listdir(tmp_path)) == ["a.arrow", "a.json", "c.arrow", "c.json", "notes.txt"]
+
+
+def test_limits_entry_count_and_clears_stale_temporaries(tmp_path):
+    now = time.time()
+    for i in range(3):
+        os.mkdir(tmp_path / str(i))
+        _write(tmp_path / str(i) / "data", 1, now)
+        os.utime(tmp_path / str(i), (now - 3 + i, now - 3 + i))
+    _write(tmp_path / ".old.tmp", 1, now - 3600)
+    _write(tmp_path / ".new.tmp", 1, now)
+
+    evict_lru(str(tmp_path), max_bytes=10 ** 6, max_entries=2, stale_tmp_seconds=600)
+
+    assert sorted(os.listdir(tmp_path)) == [".new.tmp", "1", "2"]
+
+
+def test_registry_removes_temporaries_left_by_killed_registrations(tmp_path):
+    now = time.time()
+    for name, age in ((".dead.tmp", 3600), (".writing.tmp", 3600)):
+        os.mkdir(tmp_path / name)
+        _write(tmp_path / name / "model.joblib", 1, now - age)
+        os.utime(tmp_path / name, (now - age, now - age))
+    # Still being written: the directory is old, its file is not
+    os.utime(tmp_path / ".writing.tmp" / "model.joblib", (now, now))
+
+    registry = ModelRegistry(root=str(tmp_path))
+    model_id = registry.register({"fitted": True}, None, None, {"feature_names": [], "problem_type": "regression"})
+
+    assert sorted(os.listdir(tmp_path)) == [".writing.tmp", model_id]
+
+
+def test_valid_id():
+    assert valid_id("0123456789abcdef" * 2)
+    assert not valid_id("../" + "a" * 29)
+    assert not valid_id("a" * 16)
+    assert valid_id("a" * 16, length=16)
+    assert not valid_id(None)
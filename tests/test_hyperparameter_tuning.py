@@ -0,0 +1,41 @@
+import time
+import pandas as pd
+import pytest
+from algorithms import build_model
+from hyperparameter_tuning import _Deadline, fit_estimator, tune_model
+from preprocessing import preprocess_data
+
+TIME_BUDGET = 6.0
+# Slack for the boosting round in progress when the deadline passes
+OVERRUN_ALLOWANCE = 1.5
+
+
+@pytest.fixture(scope="module")
+def lir():
+    df = pd.read_csv("LIR.csv").sample(8000, random_state=0)
+    return preprocess_data(df, "class", "median", "standard")
+
+
+@pytest.mark.parametrize("algorithm", ["XGBoost", "Gradient Boosting", "Random Forest"])
+def test_tuning_keeps_time_budget(lir, algorithm):
+    started_at = time.time()
+    model, report = tune_model(build_model(algorithm, "classification"), algorithm, lir.X_train, lir.y_train,
+                               time_budget=TIME_BUDGET, max_trials=20, n_jobs=1)
+    elapsed = time.time() - started_at
+
+    assert elapsed <= TIME_BUDGET + OVERRUN_ALLOWANCE
+    assert report["search_time"] + report["refit_time"] <= elapsed
+    assert model.predict(lir.X_test[:5]).shape == (5,)
+
+
+@pytest.mark.parametrize("algorithm", ["XGBoost", "Gradient Boosting"])
+def test_passed_deadline_stops_boosting(lir, algorithm):
+    model = build_model(algorithm, "classification").set_params(n_estimators=500)
+    deadline = _Deadline(time.time() - 1)
+    fit_estimator(model, algorithm, lir.X_train[:2000], lir.y_train[:2000], deadline=deadline)
+
+    assert deadline.reached
+    rounds = model.get_booster().num_boosted_rounds() if algorithm == "XGBoost" else model.n_estimators_
+    assert rounds == 1
+    # The callback is not left in the model's parameters
+    assert model.get_params().get("callbacks") is None
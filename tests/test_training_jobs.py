@@ -0,0 +1,54 @@
+import io
+import threading
+import time
+import numpy as np
+import pandas as pd
+from dataset_store import DatasetStore
+from training_jobs import CANCELLED, QUEUED, TrainingJobManager
+
+
+def test_cancel_queued_job_returns(tmp_path):
+    manager = TrainingJobManager(str(tmp_path), max_workers=1, queue_size=4)
+    try:
+        manager._start()
+        # Occupy the only worker and the executor's call queue so the job stays queued
+        blockers = [manager._executor.submit(time.sleep, 2) for _ in range(2)]
+        job = manager.submit({"dataset_id": "0" * 32, "target_column": "class", "algorithm": "KNN"})
+        assert job.status == QUEUED
+
+        cancel = threading.Thread(target=manager.cancel, args=(job.job_id,), daemon=True)
+        cancel.start()
+        cancel.join(timeout=10)
+
+        assert not cancel.is_alive(), "cancel() deadlocked"
+        assert job.future.cancelled()
+        assert manager.status(job.job_id)["status"] == CANCELLED
+        for blocker in blockers:
+            blocker.result()
+    finally:
+        manager.shutdown()
+
+
+def test_cancel_running_job_stops_the_fit(tmp_path):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(rng.normal(size=(4000, 8)), columns=[f"x{i}" for i in range(8)])
+    frame["target"] = frame["x0"] + rng.normal(size=len(frame))
+    dataset_id, _ = DatasetStore(str(tmp_path)).put(io.BytesIO(frame.to_csv(index=False).encode()))
+
+    manager = TrainingJobManager(str(tmp_path), max_workers=1, queue_size=1)
+    try:
+        # Minutes of boosting: only terminating the fit ends it early
+        job = manager.submit({"dataset_id": dataset_id, "target_column": "target", "algorithm": "Gradient Boosting",
+                              "hyperparameters": '{"n_estimators": 20000}'})
+        deadline = time.time() + 60
+        while manager.status(job.job_id)["stage"] != "training" and time.time() < deadline:
+            time.sleep(0.2)
+        assert manager.status(job.job_id)["stage"] == "training"
+
+        cancelled_at = time.time()
+        manager.cancel(job.job_id)
+        job.future.exception(timeout=15)
+        assert time.time() - cancelled_at < 10
+        assert manager.status(job.job_id)["status"] == CANCELLED
+    finally:
+        manager.shutdown()
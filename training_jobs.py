@@ -0,0 +1,447 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from instrumentation import log_event, observe_stages, summarize_stages
+
+# Pool sizing: concurrent trainings, cores each may use, and how many may wait
+TRAINING_WORKERS = int(os.environ.get("TRAINING_WORKERS", 2))
+TRAINING_CORES_PER_WORKER = int(os.environ.get("TRAINING_CORES_PER_WORKER", max(1, (os.cpu_count() or 1) // TRAINING_WORKERS)))
+TRAINING_QUEUE_SIZE = int(os.environ.get("TRAINING_QUEUE_SIZE", 8))
+
+# How many finished jobs are remembered for status/result lookups
+MAX_FINISHED_JOBS = 500
+
+# In a worker process: the API's list of stages recorded outside any job (see TrainingJobManager.drain_stages)
+_worker_stage_outbox = None
+
+QUEUED, RUNNING, CANCELLING = "queued", "running", "cancelling"
+SUCCEEDED, FAILED, CANCELLED = "succeeded", "failed", "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING, CANCELLING)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the training queue cannot accept another job."""
+
+
+class JobNotFoundError(KeyError):
+    """Raised for unknown (or forgotten) job IDs."""
+
+
+class JobCancelledError(Exception):
+    """Raised inside a worker at the next progress checkpoint after a cancel request."""
+
+
+class Job:
+    """Book-keeping for one submitted training job (lives in the API process)."""
+
+    def __init__(self, job_id, params):
+        self.job_id = job_id
+        self.params = params
+        self.status = QUEUED
+        self.future = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self, progress=None):
+        progress = progress or {}
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": progress.get("stage", self.status),
+            "progress": 1.0 if self.status == SUCCEEDED else progress.get("progress", 0.0),
+            "algorithm": self.params.get("algorithm"),
+            "algorithms": self.params.get("algorithms"),
+            "dataset_id": self.params.get("dataset_id"),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            # Per-model results of a comparison job, filled in as models finish
+            "results": progress.get("results", []) if self.status in ACTIVE_STATUSES else (self.result or {}).get("results", []),
+        }
+
+
+class TrainingJobManager:
+    """Runs ``train_model`` jobs on a bounded pool of worker processes.
+
+    CPU-bound fitting never touches the API process, so uploads and profiling
+    stay responsive while trainings run. With a ``model_root`` every fitted
+    model is saved to the ``model_registry`` there. Each worker is limited to
+    ``cores_per_worker`` BLAS/OpenMP threads through threadpoolctl, and at most
+    ``max_workers + queue_size`` jobs may be active before submissions are
+    refused with ``QueueFullError``.
+    """
+
+    def __init__(self, store_root, model_root=None, max_workers=TRAINING_WORKERS, cores_per_worker=TRAINING_CORES_PER_WORKER,
+                 queue_size=TRAINING_QUEUE_SIZE):
+        self.store_root = store_root
+        self.model_root = model_root
+        self.max_workers = max_workers
+        self.cores_per_worker = cores_per_worker
+        self.queue_size = queue_size
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+        self._shared = None
+        self._stage_outbox = None
+        self._warm_algorithms = None
+
+    def submit(self, params):
+        """Queue a training job; ``params`` holds the ``train_model`` arguments plus ``dataset_id``."""
+        with self._lock:
+            active = sum(job.status in ACTIVE_STATUSES for job in self._jobs.values())
+            if active >= self.max_workers + self.queue_size:
+                raise QueueFullError(f"Training queue is full ({active} active jobs). Please retry later.")
+            self._start()
+            job = Job(uuid.uuid4().hex, params)
+            self._jobs[job.job_id] = job
+            job.future = self._executor.submit(
+                _run_training_job, job.job_id, self.store_root, params, self._shared, self.cores_per_worker, self.model_root
+            )
+            self._forget_finished()
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        return job
+
+    def status(self, job_id):
+        job = self._get(job_id)
+        progress = None
+        shared = self._shared
+        if job.status in ACTIVE_STATUSES and shared is not None:
+            try:
+                progress = shared.get(job.job_id)
+            except (OSError, EOFError):  # Manager already shut down
+                progress = None
+        with self._lock:
+            # _finish may have settled the job while the progress was read
+            if job.status == QUEUED and progress is not None:
+                job.status, job.started_at = RUNNING, progress["started_at"]
+            return job.to_dict(progress)
+
+    def result(self, job_id):
+        """Returns the finished job, or ``None`` while it is still active."""
+        job = self._get(job_id)
+        return None if job.status in ACTIVE_STATUSES else job
+
+    def cancel(self, job_id):
+        """Cancel a queued job now, or a running one within a poll interval (its fitting processes are terminated)."""
+        job = self._get(job_id)
+        with self._lock:
+            if job.status not in ACTIVE_STATUSES:
+                return job
+        # Outside the lock: cancelling a queued future runs _finish (which takes it) right away
+        if job.future.cancel():
+            return job
+        with self._lock:
+            if job.status in ACTIVE_STATUSES:
+                job.status = CANCELLING
+                self._shared[("cancel", job.job_id)] = True
+        return job
+
+    def warm_up(self, algorithms=None):
+        """Start the worker processes now, each importing the estimators of ``algorithms`` (all by default).
+
+        Call before the first submission; later jobs then skip the process start-up and import cost.
+        """
+        with self._lock:
+            self._warm_algorithms = list(algorithms or [])
+            self._start()
+            futures = [self._executor.submit(_warm_up_worker) for _ in range(self.max_workers)]
+        return futures
+
+    def shutdown(self):
+        with self._lock:
+            executor, manager = self._executor, self._manager
+            self._executor = self._manager = self._shared = self._stage_outbox = None
+        if executor is not None:
+            # Cancelled futures run _finish, which takes the lock
+            executor.shutdown(wait=False, cancel_futures=True)
+            manager.shutdown()
+
+    def _start(self):
+        if self._executor is not None:
+            return
+        # Spawned (not forked) workers: the API process runs threads and an event loop
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._shared = self._manager.dict()
+        self._stage_outbox = self._manager.list()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.cores_per_worker, self._warm_algorithms, self._stage_outbox),
+        )
+
+    def drain_stages(self):
+        """Folds the stages workers recorded outside any job (chart rendering) into this process's ``/metrics``."""
+        outbox = self._stage_outbox
+        if outbox is None:
+            return
+        try:
+            records = outbox[:]
+            # Only what was read: workers may append meanwhile
+            del outbox[:len(records)]
+        except (OSError, EOFError):  # Manager already shut down
+            return
+        observe_stages(records)
+
+    def _get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise JobNotFoundError(job_id)
+        return job
+
+    def _finish(self, job, future):
+        with self._lock:
+            if job.status == CANCELLED:
+                return
+            progress = self._shared.pop(job.job_id, None) if self._shared is not None else None
+            if self._shared is not None:
+                self._shared.pop(("cancel", job.job_id), None)
+            job.started_at = job.started_at or (progress or {}).get("started_at")
+            job.finished_at = time.time()
+            error = future.exception() if not future.cancelled() else JobCancelledError()
+            if isinstance(error, JobCancelledError):
+                job.status = CANCELLED
+            elif error is not None:
+                job.status, job.error = FAILED, str(error)
+            else:
+                job.status, job.result = SUCCEEDED, future.result()
+                # Stages ran in worker processes; fold them into this process's /metrics
+                stages = list(job.result.get("stages", []))
+                for model_result in job.result.get("results", []):
+                    stages.extend(model_result.get("stages", []))
+                observe_stages(stages)
+            log_event("job", job_id=job.job_id, status=job.status, error=job.error,
+                      seconds=job.finished_at - (job.started_at or job.submitted_at),
+                      stages=summarize_stages((job.result or {}).get("stages", [])))
+        # Keeps the outbox short even when /metrics is never scraped
+        self.drain_stages()
+
+    def status_counts(self):
+        counts = dict.fromkeys((QUEUED, RUNNING, CANCELLING, SUCCEEDED, FAILED, CANCELLED), 0)
+        for job in list(self._jobs.values()):
+            counts[job.status] += 1
+        return counts
+
+    def _forget_finished(self):
+        finished = [job for job in self._jobs.values() if job.status not in ACTIVE_STATUSES]
+        for job in sorted(finished, key=lambda job: job.finished_at or 0)[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.job_id]
+
+
+def _forward_stage(outbox, record):
+    try:
+        outbox.append(record)
+    except (OSError, EOFError):  # The API process is shutting down; the timing is lost, not the chart
+        pass
+
+
+def _init_worker(cores, warm_algorithms=None, stage_outbox=None):
+    # Read by OpenMP/BLAS runtimes that are loaded after this point
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(cores)
+    if stage_outbox is not None:
+        from instrumentation import set_stage_sink
+        global _worker_stage_outbox
+        _worker_stage_outbox = stage_outbox
+        set_stage_sink(partial(_forward_stage, stage_outbox))
+    if warm_algorithms is not None:
+        import model_training  # noqa: F401  (preprocessing, tuning and metrics)
+        from algorithms import warm_up
+        warm_up(warm_algorithms)
+
+
+def _warm_up_worker():
+    return os.getpid()
+
+
+def _run_training_job(job_id, store_root, params, shared, cores, model_root=None):
+    """Worker-side entry point: load the stored dataset and train under the core budget.
+
+    When ``params`` has an ``algorithms`` list, every listed algorithm is fitted
+    side by side (see ``model_comparison``) and each model's result is published
+    to the job's progress entry as soon as it is ready. A single model is
+    trained in a child process, so that cancelling stops it mid-fit. The
+    timings of every instrumented stage are returned with the result under
+    ``stages``.
+    """
+    from instrumentation import collect_stages
+
+    with collect_stages() as stages:
+        result = _train(job_id, store_root, params, shared, cores, model_root)
+    # Comparison jobs keep each model's own stages in its result; a single model's come from its child process
+    return {**result, "stages": stages + result.get("stages", [])}
+
+
+def _train(job_id, store_root, params, shared, cores, model_root):
+    from threadpoolctl import threadpool_limits
+    from model_comparison import compare_models, summarize_comparison
+    from model_registry import ModelRegistry
+
+    started_at = time.time()
+    results = []
+
+    def report(stage, progress):
+        if shared.get(("cancel", job_id)):
+            raise JobCancelledError(job_id)
+        shared[job_id] = {"stage": stage, "progress": progress, "started_at": started_at, "results": list(results)}
+
+    report("loading", 0.0)
+    if not params.get("algorithms"):
+        return _train_in_child(job_id, store_root, params, cores, model_root, report)
+
+    # Applies to the whole (single-purpose) worker process, preprocessing included
+    threadpool_limits(limits=cores)
+    # Child processes set their own limits from their share of this worker's cores
+    for result in compare_models(
+        None,
+        params["target_column"],
+        params["algorithms"],
+        params.get("missing_value_strategy", "median"),
+        params.get("scaling_strategy", "standard"),
+        cores=cores,
+        time_budget=params.get("time_budget"),
+        progress_callback=report,
+        prepared_data=_prepare(store_root, params),
+        model_registry=ModelRegistry(model_root) if model_root else None,
+        model_meta=_model_meta(job_id, params),
+    ):
+        results.append(result)
+        report("training", 0.1 + 0.9 * len(results) / len(params["algorithms"]))
+    return summarize_comparison(results)
+
+
+def _train_in_child(job_id, store_root, params, cores, model_root, report):
+    """Runs ``_train_single_model`` in a child process and relays its progress to ``report``.
+
+    ``report`` is also called once per poll interval while the child is busy;
+    when it raises ``JobCancelledError`` the child is terminated.
+    """
+    from model_comparison import POLL_INTERVAL, fit_context
+
+    # Reaps the children of earlier jobs that stayed behind to finish their charts
+    multiprocessing.active_children()
+    context = fit_context()
+    receiver, sender = context.Pipe(duplex=False)
+    # Not a daemon: hyperparameter tuning starts processes of its own
+    process = context.Process(
+        target=_train_single_model,
+        args=(job_id, store_root, params, cores, model_root, sender, _worker_stage_outbox),
+    )
+    process.start()
+    sender.close()
+    stage, progress = "loading", 0.0
+    try:
+        while True:
+            if not receiver.poll(POLL_INTERVAL):
+                report(stage, progress)
+                continue
+            try:
+                message = receiver.recv()
+            except EOFError:
+                process.join()
+                raise RuntimeError(f"Training process exited with code {process.exitcode}")
+            if message[0] == "progress":
+                _, stage, progress = message
+                report(stage, progress)
+            elif message[0] == "error":
+                raise RuntimeError(message[1])
+            else:
+                return message[1]
+    except JobCancelledError:
+        process.terminate()
+        process.join()
+        raise
+    finally:
+        receiver.close()
+
+
+def _train_single_model(job_id, store_root, params, cores, model_root, conn, stage_outbox=None):
+    """Child-process entry point of a single-model job.
+
+    Sends ``("progress", stage, fraction)`` messages, then ``("result", result)``
+    or ``("error", message)`` over ``conn``. A requested chart is rendered
+    after the result has been sent.
+    """
+    from threadpoolctl import threadpool_limits
+    from hyperparameter_tuning import TUNING_TIME_BUDGET, TUNING_MAX_TRIALS
+    from instrumentation import collect_stages, set_stage_sink
+    from model_registry import ModelRegistry
+    from model_training import train_model
+
+    if stage_outbox is not None:
+        set_stage_sink(partial(_forward_stage, stage_outbox))
+    threadpool_limits(limits=cores)
+    try:
+        with collect_stages() as stages:
+            result = train_model(
+                None,
+                params["target_column"],
+                params["algorithm"],
+                params.get("hyperparameters", "{}"),
+                params.get("missing_value_strategy", "median"),
+                params.get("scaling_strategy", "standard"),
+                params.get("auto_tune", False),
+                params.get("generate_visualization", False),
+                progress_callback=lambda stage, progress: conn.send(("progress", stage, progress)),
+                tuning_time_budget=params.get("tuning_time_budget") or TUNING_TIME_BUDGET,
+                max_trials=params.get("max_trials") or TUNING_MAX_TRIALS,
+                n_jobs=cores,
+                prepared_data=_prepare(store_root, params),
+                model_registry=ModelRegistry(model_root) if model_root else None,
+                model_meta=_model_meta(job_id, params),
+            )
+        conn.send(("result", {**result, "stages": stages}))
+    except Exception as e:
+        conn.send(("error", str(e)))
+    finally:
+        conn.close()
+
+    if params.get("generate_visualization"):
+        from visualization import default_renderer
+        # The render thread dies with this process
+        default_renderer().wait()
+
+
+def _prepare(store_root, params):
+    """The job's preprocessed train/test split, from the preprocessing cache when it was computed before."""
+    from dataset_store import DatasetStore
+    from preprocessing import PreprocessingCache, preprocess_data
+    from instrumentation import stage
+
+    store = DatasetStore(store_root)
+    cache = PreprocessingCache(os.path.join(store_root, "preprocessed"))
+    cache_key = PreprocessingCache.key(
+        params["dataset_id"], params["target_column"], params.get("missing_value_strategy", "median"),
+        params.get("scaling_strategy", "standard"), params.get("missing_value_symbol")
+    )
+    def load():
+        with stage("loading", dataset_id=params["dataset_id"]):
+            return store.load_dataframe(params["dataset_id"], params.get("missing_value_symbol"))
+
+    # The dataset is only loaded when this preprocessing hasn't been cached yet
+    return cache.get_or_compute(cache_key, lambda: preprocess_data(
+        load(),
+        params["target_column"],
+        params.get("missing_value_strategy", "median"),
+        params.get("scaling_strategy", "standard"),
+    ))
+
+
+def _model_meta(job_id, params):
+    return {
+        "dataset_id": params["dataset_id"],
+        "missing_value_strategy": params.get("missing_value_strategy", "median"),
+        "scaling_strategy": params.get("scaling_strategy", "standard"),
+        "missing_value_symbol": params.get("missing_value_symbol"),
+        "job_id": job_id,
+    }
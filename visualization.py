@@ -0,0 +1,139 @@
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from disk_cache import evict_lru
+from instrumentation import log_event, stage
+
+# Rendered charts live under the /static mount; old ones are evicted past the size limit
+VISUALIZATION_DIR = os.environ.get("VISUALIZATION_DIR", "./static/plots")
+VISUALIZATION_URL = "/static/plots"
+VISUALIZATION_MAX_BYTES = int(os.environ.get("VISUALIZATION_MAX_BYTES", 256 * 1024 ** 2))
+
+
+def plot_key(kind, title, values):
+    """Content address of a chart: the same data and title always map to the same file."""
+    values = np.asarray(values)
+    digest = hashlib.sha256(f"{kind}\0{title}\0{values.dtype.kind}\0".encode("utf-8"))
+    if values.dtype.kind in "biuf":
+        digest.update(np.ascontiguousarray(values, dtype="float64").tobytes())
+    else:
+        digest.update("\0".join(map(str, values)).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def render_prediction_distribution(y_pred, title, path):
+    """Draws the prediction histogram (with a KDE for numeric predictions) into ``path``.
+
+    Uses a standalone Agg figure rather than pyplot, so nothing is left in a
+    global figure registry and concurrent renders cannot draw on each other.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    import seaborn as sns
+
+    y_pred = np.asarray(y_pred)
+    fig = Figure(figsize=(8, 5))
+    FigureCanvasAgg(fig)
+    try:
+        ax = fig.add_subplot()
+        sns.histplot(y_pred, kde=y_pred.dtype.kind in "iuf", ax=ax)
+        ax.set_title(title)
+        fig.savefig(path, format="png")
+    finally:
+        fig.clear()
+
+
+class VisualizationRenderer:
+    """Renders charts on a background thread into content-addressed files.
+
+    ``submit`` returns the chart's URL at once; the image appears there when
+    rendering finishes, so callers never wait for plotting. A chart whose
+    content was already rendered is reused, not drawn again. Files are
+    written under a temporary name and renamed into place, and the directory
+    is kept under ``max_bytes`` by removing the least recently used charts.
+    """
+
+    def __init__(self, root=VISUALIZATION_DIR, url_prefix=VISUALIZATION_URL, max_bytes=VISUALIZATION_MAX_BYTES, workers=1):
+        self.root = root
+        self.url_prefix = url_prefix
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self._pending = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def submit_prediction_distribution(self, y_pred, algorithm):
+        """Schedules the prediction-distribution chart for ``y_pred``; returns its URL."""
+        title = f"{algorithm} Prediction Distribution"
+        key = plot_key("prediction_distribution", title, y_pred)
+        return self._submit(key, render_prediction_distribution, np.asarray(y_pred), title)
+
+    def path_for(self, key):
+        return os.path.join(self.root, f"{key}.png")
+
+    def url_for(self, key):
+        return f"{self.url_prefix}/{key}.png"
+
+    def wait(self):
+        """Blocks until every scheduled chart has been rendered."""
+        with self._lock:
+            futures = list(self._pending.values())
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, key, render, *args):
+        path = self.path_for(key)
+        with self._lock:
+            if key in self._pending:
+                return self.url_for(key)
+            try:
+                # Cache hit: mark as recently used for eviction
+                os.utime(path)
+                return self.url_for(key)
+            except FileNotFoundError:
+                pass  # Never rendered, or just evicted by another process: render it (again)
+            self._pending[key] = self._executor.submit(self._render, key, render, *args)
+        return self.url_for(key)
+
+    def _render(self, key, render, *args):
+        tmp = os.path.join(self.root, f".{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            with stage("plotting", chart=key):
+                render(*args, tmp)
+            os.replace(tmp, self.path_for(key))
+        except Exception as e:
+            log_event("plotting_failed", chart=key, error=str(e))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            with self._lock:
+                self._pending.pop(key, None)
+        self._evict(keep=key)
+
+    def _evict(self, keep=None):
+        with self._lock:
+            evict_lru(self.root, self.max_bytes, entry_key=_chart_key_of, keep={keep})
+
+
+def _chart_key_of(name):
+    key, ext = os.path.splitext(name)
+    return key if ext == ".png" else None
+
+
+_default_renderer = None
+_default_renderer_lock = threading.Lock()
+
+
+def default_renderer():
+    """The process-wide renderer, created on first use."""
+    global _default_renderer
+    with _default_renderer_lock:
+        if _default_renderer is None:
+            _default_renderer = VisualizationRenderer()
+        return _default_renderer